@@ -0,0 +1,86 @@
+# Локальный сервер, отвечающий как Telegram Bot API.
+#
+# Принимает запросы вида /bot<token>/<method> и отвечает правдоподобным
+# результатом без задержек и ограничений частоты, чтобы бенчмарк мерил
+# бота, а не сеть. Считает вызовы каждого метода.
+import itertools
+import json
+import time
+from collections import Counter
+from typing import Any
+
+from aiohttp import web
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'HolidayBot', 'username': 'holiday_bot'}
+
+# Методы, которые возвращают отправленное или измененное сообщение
+MESSAGE_METHODS = {
+    'sendmessage', 'editmessagetext', 'editmessagereplymarkup', 'senddocument',
+    'sendanimation', 'sendvideo', 'sendvoice', 'sendsticker', 'sendphoto',
+}
+
+
+class FakeBotAPI:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self.calls: Counter[str] = Counter()
+        self._message_ids = itertools.count(1000)
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    async def _read_params(self, request: web.Request) -> dict[str, Any]:
+        if request.content_type == 'application/json':
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            params[key] = value if not isinstance(value, str) else _maybe_json(value)
+        return params
+
+    def _message(self, params: dict[str, Any]) -> dict[str, Any]:
+        chat_id = int(params.get('chat_id', 0))
+        message_id = params.get('message_id') or next(self._message_ids)
+        return {
+            'message_id': int(message_id),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group'},
+            'from': BOT_USER,
+            'text': str(params.get('text', '')),
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method'].lower()
+        self.calls[method] += 1
+        params = await self._read_params(request)
+
+        if method == 'getme':
+            result: Any = BOT_USER
+        elif method in MESSAGE_METHODS:
+            result = self._message(params)
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Если порт не задан, берем выданный системой
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+def _maybe_json(value: str) -> Any:
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
@@ -0,0 +1,112 @@
+# Регрессионный бенчмарк команды /my_events.
+#
+# Проверяет, что список мероприятий загружается одним запросом
+# (без session.merge() для каждого мероприятия), а время обращения
+# к базе и полное время хэндлера почти не растут с количеством
+# мероприятий пользователя: выводится только одна страница списка.
+#
+# Запуск (нужен пакет aiosqlite, см. requirements-dev.txt):
+#     python -m benchmarks.my_events
+import asyncio
+import statistics
+import time
+from datetime import date
+from types import SimpleNamespace
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from database import Event, get_session_maker
+from database.cache import events_cache
+from database.crud import get_events_page
+from database.migrations import run_migrations
+from handlers.user_handlers import process_my_events_command
+
+EVENT_COUNTS = (10, 100, 300, 500)
+ROUNDS = 200
+CREATOR_ID = 1
+
+# Допустимый рост медианы между наименьшим и наибольшим списком
+MAX_GROWTH = 3.0
+
+
+# Заглушка сообщения: хэндлеру нужны только from_user.id и answer()
+def make_message(creator_id: int) -> SimpleNamespace:
+    async def answer(*args, **kwargs):
+        return None
+
+    return SimpleNamespace(from_user=SimpleNamespace(id=creator_id), answer=answer)
+
+
+async def measure(session_maker, func, count: int) -> list[float]:
+    timings = []
+    creator_id = CREATOR_ID + count
+    message = make_message(creator_id)
+
+    for _ in range(ROUNDS):
+        # Сбрасываем кэш, чтобы каждый раз измерять запрос к базе
+        events_cache.clear()
+        session = session_maker()
+        started = time.perf_counter()
+        if func is get_events_page:
+            await get_events_page(session, creator_id)
+        else:
+            await func(message, session)
+        timings.append(time.perf_counter() - started)
+        await session.close()
+
+    return sorted(timings)
+
+
+async def main():
+    engine = create_async_engine('sqlite+aiosqlite://', poolclass=StaticPool)
+    session_maker = get_session_maker(engine)
+
+    async with engine.begin() as conn:
+        await run_migrations(conn)
+        for count in EVENT_COUNTS:
+            await conn.execute(insert(Event), [
+                {'title': f'Event {i}', 'date': date(2030, 1, 1), 'creator_id': CREATOR_ID + count}
+                for i in range(count)
+            ])
+
+    # Считаем SQL-запросы, выполненные за время бенчмарка
+    statements = 0
+
+    def count_statement(*args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', count_statement)
+
+    medians = {}
+    handler_medians = {}
+    print(f'{"events":>8} {"queries":>8} {"db p50, ms":>11} {"db p95, ms":>11} {"handler p50, ms":>16}')
+    for count in EVENT_COUNTS:
+        db_timings = await measure(session_maker, get_events_page, count)
+        statements = 0
+        handler_timings = await measure(session_maker, process_my_events_command, count)
+        queries = statements / ROUNDS
+
+        medians[count] = statistics.median(db_timings)
+        handler_medians[count] = statistics.median(handler_timings)
+        p95 = db_timings[int(len(db_timings) * 0.95)]
+        print(
+            f'{count:>8} {queries:>8.1f} {medians[count] * 1000:>11.3f} '
+            f'{p95 * 1000:>11.3f} {handler_medians[count] * 1000:>16.3f}'
+        )
+        if queries != 1:
+            raise SystemExit(f'/my_events runs {queries:.1f} queries for {count} events')
+
+    await engine.dispose()
+
+    for name, values in (('query', medians), ('handler', handler_medians)):
+        growth = values[EVENT_COUNTS[-1]] / values[EVENT_COUNTS[0]]
+        print(f'{name} growth {EVENT_COUNTS[0]} -> {EVENT_COUNTS[-1]}: x{growth:.2f}')
+        if growth > MAX_GROWTH:
+            raise SystemExit(f'/my_events {name} latency grows x{growth:.2f} (limit x{MAX_GROWTH})')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -18,6 +18,109 @@ class settings:
     DB_PASS: str = os.getenv('DB_PASS')
     DB_NAME: str = os.getenv('DB_NAME')
     
+    # Пул соединений и логирование SQL
+    DB_ECHO: bool = os.getenv('DB_ECHO', 'false').lower() == 'true'
+    DB_POOL_SIZE: int = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE: int = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 100))
+    DB_QUERY_CACHE_SIZE: int = int(os.getenv('DB_QUERY_CACHE_SIZE', 500))
+    
+    # Кэш списков мероприятий
+    EVENTS_CACHE_SIZE: int = int(os.getenv('EVENTS_CACHE_SIZE', 10000))
+    EVENTS_CACHE_TTL: float = float(os.getenv('EVENTS_CACHE_TTL', 300))
+    
+    # Кэш готовых клавиатур списков
+    KEYBOARDS_CACHE_SIZE: int = int(os.getenv('KEYBOARDS_CACHE_SIZE', 10000))
+    
+    # Размер страницы в списках мероприятий и участников
+    EVENTS_PAGE_SIZE: int = int(os.getenv('EVENTS_PAGE_SIZE', 10))
+    PARTICIPANTS_PAGE_SIZE: int = int(os.getenv('PARTICIPANTS_PAGE_SIZE', 20))
+    
+    # Поиск гостей: сколько результатов показывать, минимальное сходство
+    # имени с запросом (как pg_trgm.similarity_threshold) и сколько
+    # индексов держать в памяти для баз без pg_trgm
+    SEARCH_LIMIT: int = int(os.getenv('SEARCH_LIMIT', 20))
+    SEARCH_MIN_SIMILARITY: float = float(os.getenv('SEARCH_MIN_SIMILARITY', 0.3))
+    SEARCH_INDEX_CACHE_SIZE: int = int(os.getenv('SEARCH_INDEX_CACHE_SIZE', 100))
+    
+    # Сверка счетчиков участников с таблицей participants:
+    # период в секундах (0 - не сверять) и размер порции мероприятий
+    COUNTER_REPAIR_INTERVAL: float = float(os.getenv('COUNTER_REPAIR_INTERVAL', 24 * 60 * 60))
+    COUNTER_REPAIR_BATCH_SIZE: int = int(os.getenv('COUNTER_REPAIR_BATCH_SIZE', 1000))
+    
+    # Ограничения массового добавления участников
+    PARTICIPANTS_IMPORT_LIMIT: int = int(os.getenv('PARTICIPANTS_IMPORT_LIMIT', 1000))
+    PARTICIPANTS_IMPORT_FILE_SIZE: int = int(os.getenv('PARTICIPANTS_IMPORT_FILE_SIZE', 1024 * 1024))
+    
+    # Хранилище FSM: memory, redis или inprocess
+    FSM_STORAGE: str = os.getenv('FSM_STORAGE', 'memory')
+    REDIS_URL: str = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    FSM_STATE_TTL: int = int(os.getenv('FSM_STATE_TTL', 0))
+    FSM_DATA_TTL: int = int(os.getenv('FSM_DATA_TTL', 0))
+    
+    # Режим получения апдейтов: polling, webhook или sharded
+    # (вебхук принимает фронтовый процесс и раздает апдейты процессам-шардам)
+    RUN_MODE: str = os.getenv('RUN_MODE', 'polling')
+    WEBHOOK_URL: str = os.getenv('WEBHOOK_URL')
+    WEBHOOK_PATH: str = os.getenv('WEBHOOK_PATH', '/webhook')
+    WEBHOOK_SECRET: str = os.getenv('WEBHOOK_SECRET')
+    WEBAPP_HOST: str = os.getenv('WEBAPP_HOST', '0.0.0.0')
+    WEBAPP_PORT: int = int(os.getenv('WEBAPP_PORT', 8080))
+    WEBHOOK_WORKERS: int = int(os.getenv('WEBHOOK_WORKERS', 8))
+    WEBHOOK_QUEUE_SIZE: int = int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000))
+    
+    # Общий срок остановки по сигналу: за это время дорабатываются
+    # уже принятые апдейты и начатая пачка напоминаний
+    SHUTDOWN_TIMEOUT: float = float(os.getenv('SHUTDOWN_TIMEOUT', 25))
+    
+    # Процессы-шарды в режиме sharded: число процессов и их локальные адреса
+    SHARD_WORKERS: int = int(os.getenv('SHARD_WORKERS', os.cpu_count() or 1))
+    SHARD_HOST: str = os.getenv('SHARD_HOST', '127.0.0.1')
+    SHARD_BASE_PORT: int = int(os.getenv('SHARD_BASE_PORT', 8100))
+    SHARD_PATH: str = os.getenv('SHARD_PATH', '/update')
+    SHARD_RESTART_DELAY: float = float(os.getenv('SHARD_RESTART_DELAY', 1))
+    
+    # Параллельная обработка апдейтов: сколько чатов обрабатывается
+    # одновременно, сколько апдейтов может ждать в очередях и сколько
+    # из них - от одного чата (лишние апдейты чата отбрасываются)
+    UPDATE_WORKERS: int = int(os.getenv('UPDATE_WORKERS', 16))
+    UPDATE_MAX_PENDING: int = int(os.getenv('UPDATE_MAX_PENDING', 1000))
+    UPDATE_MAX_PENDING_PER_CHAT: int = int(os.getenv('UPDATE_MAX_PENDING_PER_CHAT', 20))
+    
+    # Ограничение частоты исходящих запросов к Telegram (запросов в секунду)
+    OUTBOUND_GLOBAL_RATE: float = float(os.getenv('OUTBOUND_GLOBAL_RATE', 30))
+    OUTBOUND_CHAT_RATE: float = float(os.getenv('OUTBOUND_CHAT_RATE', 1))
+    OUTBOUND_CHAT_BURST: float = float(os.getenv('OUTBOUND_CHAT_BURST', 3))
+    OUTBOUND_GROUP_RATE: float = float(os.getenv('OUTBOUND_GROUP_RATE', 20 / 60))
+    OUTBOUND_MAX_RETRIES: int = int(os.getenv('OUTBOUND_MAX_RETRIES', 3))
+    OUTBOUND_MAX_CHATS: int = int(os.getenv('OUTBOUND_MAX_CHATS', 10000))
+    
+    # Сколько последних сообщений бота помнить, чтобы не отправлять
+    # редактирования, которые ничего не меняют
+    OUTBOUND_MAX_MESSAGES: int = int(os.getenv('OUTBOUND_MAX_MESSAGES', 10000))
+    
+    # Отбрасывание повторных нажатий кнопок (окно в секундах)
+    THROTTLE_WINDOW: float = float(os.getenv('THROTTLE_WINDOW', 1))
+    THROTTLE_MAX_KEYS: int = int(os.getenv('THROTTLE_MAX_KEYS', 10000))
+    
+    # Напоминания о мероприятиях
+    REMINDERS_ENABLED: bool = os.getenv('REMINDERS_ENABLED', 'true').lower() == 'true'
+    REMINDER_DAYS_BEFORE: int = int(os.getenv('REMINDER_DAYS_BEFORE', 1))
+    REMINDER_HOUR: int = int(os.getenv('REMINDER_HOUR', 10))
+    REMINDER_BATCH_SIZE: int = int(os.getenv('REMINDER_BATCH_SIZE', 100))
+    REMINDER_RATE: float = float(os.getenv('REMINDER_RATE', 20))
+    REMINDER_CHECK_INTERVAL: float = float(os.getenv('REMINDER_CHECK_INTERVAL', 60))
+    
+    # Размер порции строк при выгрузке списков участников
+    EXPORT_BATCH_SIZE: int = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+    
+    # Метрики в формате Prometheus на http://METRICS_HOST:METRICS_PORT/metrics
+    METRICS_ENABLED: bool = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_HOST: str = os.getenv('METRICS_HOST', '127.0.0.1')
+    METRICS_PORT: int = int(os.getenv('METRICS_PORT', 9100))
+    
     
 def get_db_url():
     return URL.create(
@@ -1,2 +1,3 @@
-from .models import Event, Participant
+from .models import BotMeta, Event, Participant
+from .records import EventRecord, Page, ParticipantRecord, ReminderRecord, SearchResultRecord
 from .database import async_sessionmaker, create_async_engine, create_engine, get_session_maker
\ No newline at end of file
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from itertools import count
+from time import monotonic
+from typing import Any, Hashable, Optional
+
+from config_data.config import settings
+
+
+# LRU-кэш с ограниченным размером и временем жизни записей.
+# Используется, чтобы не ходить в базу данных за одним и тем же
+# списком мероприятий при каждом нажатии кнопок "Назад"/"Отмена".
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+        # Счетчики попаданий и промахов
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = item
+        if expires_at < monotonic():
+            # Запись устарела - удаляем ее и считаем промахом
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        # Помечаем запись как недавно использованную
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+
+        # Вытесняем самые давно использованные записи
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._data),
+        }
+
+
+# Версии данных по ключу (например, по ID создателя мероприятий).
+# Версия входит в ключ кэша, поэтому смена версии делает недоступными
+# сразу все закэшированные страницы. Хранится ограниченное число версий:
+# для вытесненного ключа выдается новая, ни разу не использованная версия.
+class DataVersions:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._versions: OrderedDict[Hashable, int] = OrderedDict()
+        self._counter = count(1)
+
+    def get(self, key: Hashable) -> int:
+        version = self._versions.get(key)
+        if version is None:
+            return self.bump(key)
+
+        self._versions.move_to_end(key)
+        return version
+
+    def bump(self, key: Hashable) -> int:
+        version = next(self._counter)
+        self._versions[key] = version
+        self._versions.move_to_end(key)
+
+        while len(self._versions) > self.maxsize:
+            self._versions.popitem(last=False)
+        return version
+
+
+# Кэш страниц списков мероприятий.
+# Ключ: (ID создателя, версия списка, курсор, направление)
+events_cache = TTLCache(
+    maxsize=settings.EVENTS_CACHE_SIZE,
+    ttl=settings.EVENTS_CACHE_TTL,
+)
+events_versions = DataVersions(maxsize=settings.EVENTS_CACHE_SIZE)
+
+
+# Сбрасывает закэшированные страницы мероприятий пользователя
+# и возвращает новую версию списка
+def invalidate_events(creator_id: int) -> int:
+    return events_versions.bump(creator_id)
@@ -1,80 +1,425 @@
+from datetime import date
+from typing import AsyncIterator, Optional
+
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
-from sqlalchemy import Integer, and_, cast, delete, func, insert, inspect, or_, select, text
+from sqlalchemy import Integer, and_, cast, delete, func, insert, inspect, or_, select, text, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import aliased, contains_eager, joinedload, selectinload
 
+from config_data.config import settings
 from database.database import Base
-from .models import Event, Participant
+from metrics.instruments import timed
+from .cache import events_cache, events_versions, invalidate_events
+from .models import BotMeta, Event, Participant
+from .records import EventRecord, Page, ParticipantRecord, ReminderRecord, SearchResultRecord
+from .search import TrigramIndex, search_indexes
 
 
 
-# Создает мероприятие пользователя
-async def create_event(session: AsyncSession, event_name: str, event_date: str, creator_id: int):
+# Создает мероприятие пользователя и возвращает его ID
+@timed
+async def create_event(session: AsyncSession, event_name: str, event_date: date, creator_id: int) -> int:
     async with session.begin():
-        new_event = Event(title=event_name, date=event_date, creator_id=creator_id)
-        session.add(new_event)
+        result = await session.execute(
+            insert(Event)
+            .values(title=event_name, date=event_date, creator_id=creator_id)
+            .returning(Event.id)
+        )
+        event_id = result.scalar_one()
+    
+    # Список мероприятий пользователя изменился
+    invalidate_events(creator_id)
+    return event_id
 
 
 
-# Выдает список мероприятий пользователя
-async def get_events(session: AsyncSession, creator_id: int):
-    async with session as session:
-        result = await session.execute(
-            select(Event)
-            .where(Event.creator_id == creator_id))
-        return result.scalars().all()
+# Выбирает одну страницу списка по курсору на id (keyset-пагинация).
+# Вперед - записи с id больше курсора, назад - с id меньше курсора.
+# Лишняя запись в LIMIT показывает, есть ли еще страница в ту же сторону.
+# Если передан deletion (DELETE ... RETURNING id), удаление и выборка
+# страницы выполняются в одной транзакции, а на PostgreSQL - одним
+# запросом: удаление идет в CTE, а удаленные строки исключаются из выборки.
+# on_delete строит по числу удаленных строк UPDATE счетчиков, который
+# выполняется в той же транзакции (на PostgreSQL - еще одним CTE).
+async def _get_page(session: AsyncSession, query, id_column, record, cursor: int,
+                    backward: bool, limit: int, deletion=None, on_delete=None) -> Page:
+    if backward:
+        page_query = query.where(id_column < cursor).order_by(id_column.desc())
+    else:
+        page_query = query.where(id_column > cursor).order_by(id_column)
+    
+    async with session as session, session.begin():
+        if deletion is not None:
+            if session.bind.dialect.name == 'postgresql':
+                # Запрос видит таблицу до удаления, поэтому исключаем удаленные
+                deleted = deletion.cte('deleted')
+                page_query = page_query.where(id_column.not_in(select(deleted.c.id)))
+                if on_delete is not None:
+                    # Как и на остальных базах, счетчики не трогаем, если ничего
+                    # не удалено (повторное нажатие): строка не перезаписывается
+                    # и не блокируется зря
+                    deleted_count = select(func.count()).select_from(deleted).scalar_subquery()
+                    counted = on_delete(deleted_count).where(select(deleted.c.id).exists())
+                    page_query = page_query.add_cte(counted.cte('counted'))
+            else:
+                # Остальные базы не поддерживают DELETE внутри WITH
+                result = await session.execute(deletion)
+                deleted_count = len(result.all())
+                if on_delete is not None and deleted_count:
+                    await session.execute(on_delete(deleted_count))
+        
+        result = await session.execute(page_query.limit(limit + 1))
+        items = list(map(record._make, result.tuples()))
+    
+    has_more = len(items) > limit
+    items = items[:limit]
+    
+    if backward:
+        if not has_more:
+            # Дошли до начала списка - показываем первую полную страницу
+            return await _get_page(session, query, id_column, record, 0, False, limit)
+        items.reverse()
+        return Page(tuple(items), has_prev=True, has_next=True)
+    
+    if not items and cursor > 0:
+        # Записи после курсора удалены - показываем предыдущую страницу
+        page = await _get_page(session, query, id_column, record, cursor + 1, True, limit)
+        return page._replace(has_next=False)
+    
+    return Page(tuple(items), has_prev=cursor > 0, has_next=has_more)
+
 
+# Выдает страницу списка мероприятий пользователя.
+# Клавиатурам нужны только id, название и число участников, поэтому
+# загружаем одним запросом только эти колонки, без ORM-объектов.
+# Число участников хранится в events.participant_count - без COUNT(*).
+@timed
+async def get_events_page(session: AsyncSession, creator_id: int, cursor: int = 0,
+                          backward: bool = False) -> Page:
+    key = (creator_id, events_versions.get(creator_id), cursor, backward)
+    page = events_cache.get(key)
+    if page is not None:
+        return page
+    
+    page = await _get_events_page(session, creator_id, cursor, backward)
+    
+    events_cache.set(key, page)
+    return page
 
-# Выдает список мероприятий для изменения
-async def edit_events(session: AsyncSession, event_id: int):
+
+async def _get_events_page(session: AsyncSession, creator_id: int, cursor: int,
+                           backward: bool, deletion=None) -> Page:
+    return await _get_page(
+        session,
+        select(Event.id, Event.title, Event.participant_count).where(Event.creator_id == creator_id),
+        Event.id, EventRecord, cursor, backward, settings.EVENTS_PAGE_SIZE, deletion,
+    )
+
+
+# Выдает мероприятие для изменения
+@timed
+async def edit_events(session: AsyncSession, event_id: int) -> Optional[EventRecord]:
     async with session as session:
         result = await session.execute(
-            select(Event)
+            select(Event.id, Event.title, Event.participant_count)
             .where(Event.id == event_id))
-        return result.scalars().first()
+        row = result.tuples().first()
+    
+    return EventRecord._make(row) if row is not None else None
 
 
-# Создает участника для мероприятия пользователя
-async def create_participants(session: AsyncSession, event_id: int, participant_name: str):
+# Добавляет участников в мероприятие одним многострочным INSERT ... RETURNING
+# и увеличивает счетчик участников мероприятия в той же транзакции.
+# Повторы внутри списка и имена, которые уже есть в мероприятии, пропускаются.
+# Возвращает только добавленных участников.
+@timed
+async def create_participants(session: AsyncSession, event_id: int,
+                              participant_names: list[str]) -> list[ParticipantRecord]:
+    names = list(dict.fromkeys(participant_names))
+    
     async with session.begin():
+        result = await session.execute(
+            select(Participant.username)
+            .where(Participant.event_id == event_id, Participant.username.in_(names))
+        )
+        existing = set(result.scalars())
         
-        new_participant = Participant(event_id=event_id, username=participant_name)
-        session.add(new_participant)
+        new_names = [name for name in names if name not in existing]
+        if not new_names:
+            return []
         
         result = await session.execute(
-            select(Event)
-            .options(selectinload(Event.participants))
-            .where(Event.id == event_id)
+            insert(Participant)
+            .values([{'event_id': event_id, 'username': name} for name in new_names])
+            .returning(Participant.id, Participant.username, Participant.event_id)
         )
+        added = list(map(ParticipantRecord._make, result.tuples()))
         
-    return result.scalars().first()
+        # Счетчик участников меняется в той же транзакции
+        result = await session.execute(
+            update(Event)
+            .where(Event.id == event_id)
+            .values(participant_count=Event.participant_count + len(added))
+            .returning(Event.creator_id)
+        )
+        creator_id = result.scalar()
+    
+    # В списках мероприятий создателя изменилось число участников
+    if creator_id is not None:
+        invalidate_events(creator_id)
+        search_indexes.invalidate(creator_id)
+    return added
 
 
-# Выдает список мероприятий с его участниками
-async def get_participants_for_event(session: AsyncSession, event_id: int):
-    async with session as session:
-        result = await session.execute(
-            select(Participant)
-            .options(selectinload(Participant.event))
-            .where(Participant.event_id == event_id)
+# Выдает страницу списка участников мероприятия
+@timed
+async def get_participants_page(session: AsyncSession, event_id: int, cursor: int = 0,
+                                backward: bool = False, deletion=None, on_delete=None) -> Page:
+    return await _get_page(
+        session,
+        select(Participant.id, Participant.username, Participant.event_id)
+        .where(Participant.event_id == event_id),
+        Participant.id, ParticipantRecord, cursor, backward, settings.PARTICIPANTS_PAGE_SIZE,
+        deletion, on_delete,
+    )
+
+
+# Удаляет мероприятие (участники удаляются каскадно) и выдает
+# обновленную страницу списка мероприятий с тем же курсором
+@timed
+async def delete_events(session: AsyncSession, creator_id: int, event_id: int,
+                        cursor: int = 0) -> Page:
+    deletion = (
+        delete(Event)
+        .where(Event.id == event_id, Event.creator_id == creator_id)
+        .returning(Event.id)
+    )
+    page = await _get_events_page(session, creator_id, cursor, False, deletion)
+    
+    # Список изменился - старые страницы в кэше больше не нужны,
+    # а только что выбранную сразу кладем в кэш
+    version = invalidate_events(creator_id)
+    events_cache.set((creator_id, version, cursor, False), page)
+    search_indexes.invalidate(creator_id)
+    return page
+
+
+# Удаляет участника из мероприятия пользователя, уменьшает счетчик
+# участников и выдает обновленную страницу списка участников
+# с тем же курсором - все в одной транзакции
+@timed
+async def delete_participants(session: AsyncSession, creator_id: int, participant_id: int,
+                              event_id: int, cursor: int = 0) -> Page:
+    owned_event = select(Event.id).where(Event.id == event_id, Event.creator_id == creator_id)
+    deletion = (
+        delete(Participant)
+        .where(Participant.id == participant_id, Participant.event_id.in_(owned_event))
+        .returning(Participant.id)
+    )
+    
+    def on_delete(deleted_count):
+        return (
+            update(Event)
+            .where(Event.id == event_id, Event.creator_id == creator_id)
+            .values(participant_count=Event.participant_count - deleted_count)
+            .returning(Event.id)
         )
     
-    return result.scalars().all()
+    page = await get_participants_page(session, event_id, cursor, deletion=deletion, on_delete=on_delete)
+    invalidate_events(creator_id)
+    search_indexes.invalidate(creator_id)
+    return page
+
+
+# Выдает мероприятия без отправленного напоминания с датой в диапазоне
+# [date_from, date_to], упорядоченные по (дата, id). Выборка идет по индексу
+# ix_events_date_id порциями: after - (дата, id) последней полученной записи.
+@timed
+async def get_events_for_reminders(session: AsyncSession, date_from: date, date_to: date,
+                                   after: Optional[tuple[date, int]], limit: int) -> list[ReminderRecord]:
+    query = (
+        select(Event.id, Event.title, Event.date, Event.creator_id)
+        .where(Event.date.between(date_from, date_to), Event.reminded.is_(False))
+    )
+    if after is not None:
+        query = query.where(tuple_(Event.date, Event.id) > tuple_(*after))
+    
+    async with session as session:
+        result = await session.execute(query.order_by(Event.date, Event.id).limit(limit))
+        return list(map(ReminderRecord._make, result.tuples()))
+
+
+# Выдает мероприятия с id больше after_id (созданные после прошлой
+# проверки) в диапазоне дат, напоминания о которых еще не отправлены.
+# Порции выбираются по первичному ключу, поэтому запрос читает только
+# новые строки таблицы.
+@timed
+async def get_new_events_for_reminders(session: AsyncSession, date_from: date, date_to: date,
+                                       after_id: int, limit: int) -> list[ReminderRecord]:
+    query = (
+        select(Event.id, Event.title, Event.date, Event.creator_id)
+        .where(Event.id > after_id, Event.date.between(date_from, date_to), Event.reminded.is_(False))
+        .order_by(Event.id)
+        .limit(limit)
+    )
+    async with session as session:
+        result = await session.execute(query)
+        return list(map(ReminderRecord._make, result.tuples()))
+
 
+# Выдает наибольший id мероприятия (0, если мероприятий нет)
+async def get_max_event_id(session: AsyncSession) -> int:
+    async with session as session:
+        return await session.scalar(select(func.max(Event.id))) or 0
 
-# Удаляет мероприятие и участников вместе с ним
-async def delete_events(session: AsyncSession, creator_id: int, event_id: int):
+
+# Забирает напоминания о мероприятиях перед отправкой: отмечает их
+# отправленными и возвращает ID только тех, что еще не были отмечены.
+# Удаленные мероприятия и напоминания, уже забранные другим процессом,
+# в результат не попадут - их отправлять не нужно.
+@timed
+async def claim_event_reminders(session: AsyncSession, event_ids: list[int]) -> set[int]:
     async with session.begin():
-        await session.execute(
-            delete(Event)
-            .where(Event.id == event_id, Event.creator_id == creator_id)
+        result = await session.execute(
+            update(Event)
+            .where(Event.id.in_(event_ids), Event.reminded.is_(False))
+            .values(reminded=True)
+            .returning(Event.id)
         )
-        await session.commit()
+        return set(result.scalars())
+
+
+# Построчно выдает участников мероприятий пользователя (или одного
+# мероприятия) для выгрузки: (название, дата, имя участника).
+# Строки читаются курсором на стороне сервера порциями по yield_per,
+# поэтому в памяти не держится весь список.
+async def stream_participants(session: AsyncSession, creator_id: int,
+                              event_id: Optional[int] = None) -> AsyncIterator[tuple[str, date, str]]:
+    query = (
+        select(Event.title, Event.date, Participant.username)
+        .join(Participant, Participant.event_id == Event.id)
+        .where(Event.creator_id == creator_id)
+    )
+    if event_id is not None:
+        query = query.where(Event.id == event_id)
+    query = (
+        query.order_by(Event.date, Event.id, Participant.id)
+        .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+    )
+    
+    async with session as session:
+        result = await session.stream(query)
+        async for row in result.tuples():
+            yield row
 
-# Удаляет участников из мероприятия
-async def delete_participants(session: AsyncSession, participant_id: int, event_id: int):
+
+# Ищет гостей во всех мероприятиях пользователя по подстроке имени
+# или по похожести (триграммы). Результаты отсортированы по сходству.
+# На PostgreSQL поиск идет по GIN-индексу ix_participants_username_trgm
+# (pg_trgm), на остальных базах - по индексу в памяти процесса.
+@timed
+async def search_participants(session: AsyncSession, creator_id: int, name: str,
+                              limit: int = settings.SEARCH_LIMIT) -> list[SearchResultRecord]:
+    query = (
+        select(Participant.id, Participant.username, Participant.event_id, Event.title)
+        .join(Event, Event.id == Participant.event_id)
+        .where(Event.creator_id == creator_id)
+    )
+    
+    async with session as session:
+        if session.bind.dialect.name != 'postgresql':
+            return await _search_in_memory(session, query, creator_id, name, limit)
+        
+        async with session.begin():
+            # Порог сходства для оператора % - только в этой транзакции
+            threshold = str(settings.SEARCH_MIN_SIMILARITY)
+            await session.execute(select(func.set_config('pg_trgm.similarity_threshold', threshold, True)))
+            
+            result = await session.execute(
+                query
+                .where(or_(
+                    Participant.username.ilike(_contains_pattern(name), escape='!'),
+                    Participant.username.op('%')(name),
+                ))
+                .order_by(func.similarity(Participant.username, name).desc(), Participant.id)
+                .limit(limit)
+            )
+            return list(map(SearchResultRecord._make, result.tuples()))
+
+
+# Шаблон LIKE "содержит подстроку". Спецсимволы экранируются "!",
+# а не обратной косой чертой, которую базы трактуют по-разному.
+def _contains_pattern(value: str) -> str:
+    escaped = value.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+    return f'%{escaped}%'
+
+
+# Поиск по индексу в памяти: индекс создателя строится одним запросом
+# при первом поиске и заново - после изменения участников
+async def _search_in_memory(session: AsyncSession, query, creator_id: int, name: str,
+                            limit: int) -> list[SearchResultRecord]:
+    index = search_indexes.get(creator_id)
+    if index is None:
+        version = search_indexes.version(creator_id)
+        result = await session.execute(query)
+        index = TrigramIndex(map(SearchResultRecord._make, result.tuples()))
+        search_indexes.set(creator_id, version, index)
+    
+    return index.search(name, limit, settings.SEARCH_MIN_SIMILARITY)
+
+
+# Сверяет счетчики участников порции мероприятий с id больше after
+# с таблицей participants и исправляет расхождения.
+# Возвращает число исправленных мероприятий и id последнего
+# проверенного (None, если мероприятия закончились).
+# Порция сначала блокируется (SELECT ... FOR UPDATE): пока идет сверка,
+# create_participants и delete_participants не могут изменить ее счетчики,
+# а пересчет - отдельный запрос, который видит все их завершенные транзакции.
+# Без блокировки подзапрос в UPDATE мог посчитать участников по старому
+# снимку и записать устаревшее значение поверх верного.
+@timed
+async def repair_participant_counts(session: AsyncSession, after: int,
+                                    limit: int) -> tuple[int, Optional[int]]:
     async with session.begin():
-        await session.execute(
-            delete(Participant)
-            .where(Participant.id == participant_id, Participant.event_id == event_id)
+        result = await session.execute(
+            select(Event.id).where(Event.id > after).order_by(Event.id).limit(limit).with_for_update()
+        )
+        event_ids = result.scalars().all()
+        if not event_ids:
+            return 0, None
+        
+        actual = (
+            select(func.count(Participant.id))
+            .where(Participant.event_id == Event.id)
+            .scalar_subquery()
+        )
+        result = await session.execute(
+            update(Event)
+            .where(Event.id.between(event_ids[0], event_ids[-1]), Event.participant_count != actual)
+            .values(participant_count=actual)
+            .returning(Event.creator_id)
         )
-        await session.commit()
+        creator_ids = result.scalars().all()
+    
+    for creator_id in set(creator_ids):
+        invalidate_events(creator_id)
+    return len(creator_ids), event_ids[-1]
+
+
+# Выдает служебное значение бота по ключу
+@timed
+async def get_meta(session: AsyncSession, key: str) -> Optional[str]:
+    async with session as session:
+        result = await session.execute(select(BotMeta.value).where(BotMeta.key == key))
+        return result.scalar()
+
+
+# Сохраняет служебное значение бота. Если несколько процессов
+# записывают один ключ одновременно, остается значение одного из них.
+@timed
+async def set_meta(session: AsyncSession, key: str, value: str) -> None:
+    try:
+        async with session.begin():
+            await session.merge(BotMeta(key=key, value=value))
+    except IntegrityError:
+        pass
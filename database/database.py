@@ -4,21 +4,43 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, Asyn
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 
-from config_data import get_db_url
+from config_data import get_db_url, settings
 
 class Base(DeclarativeBase):
     pass
 
+
+# Создает движок базы данных. Движок один на процесс: его пул
+# соединений используется и для миграций, и для сессий хэндлеров.
 def create_engine() -> AsyncEngine:
-    return create_async_engine(url=get_db_url(), echo=True, pool_pre_ping=True)
+    return create_async_engine(
+        url=get_db_url(),
+        echo=settings.DB_ECHO,
+        pool_pre_ping=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+        connect_args={
+            # Кэш подготовленных выражений asyncpg (0 - для pgbouncer)
+            'prepared_statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    )
 
 
 def get_session_maker(engine: AsyncEngine) -> async_sessionmaker[Union[AsyncSession, Any]]:
     return async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=True)
 
 
-async def init_models():
-    engine = create_engine()
+# Приводит схему к последней версии. Если схема уже актуальна
+# (обычный перезапуск), обходится одним SELECT: без advisory-блокировки,
+# DDL и чтения системного каталога.
+async def init_models(engine: AsyncEngine):
+    from .migrations import LATEST_VERSION, get_schema_version, run_migrations
+    
+    if await get_schema_version(engine) == LATEST_VERSION:
+        return
+    
     async with engine.begin() as conn:
-        # await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await run_migrations(conn)
\ No newline at end of file
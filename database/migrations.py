@@ -0,0 +1,117 @@
+import logging
+from typing import Callable, Optional, Union
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from database.database import Base
+from database import models  # noqa: F401 - регистрирует таблицы в Base.metadata
+
+logger = logging.getLogger(__name__)
+
+# Шаг миграции - SQL-выражение или функция, принимающая соединение
+MigrationStep = Union[str, Callable[[AsyncConnection], object]]
+
+
+# GIN-индекс pg_trgm есть только в PostgreSQL; на других базах
+# поиск гостей использует индекс в памяти (database/search.py)
+async def _create_username_trgm_index(conn: AsyncConnection) -> None:
+    if conn.dialect.name != 'postgresql':
+        return
+    await conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    await conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_participants_username_trgm '
+        'ON participants USING gin (username gin_trgm_ops)'
+    ))
+
+
+# Версионированные миграции схемы. Новые миграции добавляются в конец
+# списка со следующим номером версии; уже выпущенные не меняются.
+MIGRATIONS: list[tuple[int, str, list[MigrationStep]]] = [
+    (1, 'Начальная схема: events и participants', []),
+    (2, 'Индексы по events.creator_id и participants.event_id', [
+        'CREATE INDEX IF NOT EXISTS ix_events_creator_id_id '
+        'ON events (creator_id, id)',
+        'CREATE INDEX IF NOT EXISTS ix_participants_event_id_id '
+        'ON participants (event_id, id)',
+    ]),
+    (3, 'Напоминания о мероприятиях: events.reminded и индекс по дате', [
+        'ALTER TABLE events ADD COLUMN reminded BOOLEAN NOT NULL DEFAULT false',
+        'CREATE INDEX IF NOT EXISTS ix_events_date_id ON events (date, id)',
+    ]),
+    (4, 'Служебные значения бота: bot_meta', [
+        'CREATE TABLE IF NOT EXISTS bot_meta (key VARCHAR PRIMARY KEY, value VARCHAR NOT NULL)',
+    ]),
+    (5, 'Триграммный индекс по participants.username для поиска гостей', [
+        _create_username_trgm_index,
+    ]),
+    (6, 'Счетчик участников events.participant_count', [
+        'ALTER TABLE events ADD COLUMN participant_count INTEGER NOT NULL DEFAULT 0',
+        'UPDATE events SET participant_count = '
+        '(SELECT count(*) FROM participants WHERE participants.event_id = events.id)',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Ключ advisory-блокировки, чтобы несколько процессов
+# не применяли миграции одновременно
+MIGRATIONS_LOCK_ID = 7241105
+
+
+async def _get_version(conn: AsyncConnection) -> Optional[int]:
+    result = await conn.execute(text('SELECT max(version) FROM schema_version'))
+    return result.scalar()
+
+
+# Версия схемы без блокировок и DDL: None, если таблицы версий еще нет
+async def get_schema_version(engine: AsyncEngine) -> Optional[int]:
+    try:
+        async with engine.connect() as conn:
+            return await _get_version(conn)
+    except DBAPIError:
+        return None
+
+
+async def _set_version(conn: AsyncConnection, version: int) -> None:
+    await conn.execute(text('DELETE FROM schema_version'))
+    await conn.execute(
+        text('INSERT INTO schema_version (version) VALUES (:version)'),
+        {'version': version},
+    )
+
+
+# Приводит схему базы данных к последней версии
+async def run_migrations(conn: AsyncConnection) -> None:
+    if conn.dialect.name == 'postgresql':
+        await conn.execute(text('SELECT pg_advisory_xact_lock(:id)'), {'id': MIGRATIONS_LOCK_ID})
+
+    await conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'
+    ))
+    current = await _get_version(conn)
+
+    if current is None:
+        has_events = await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table('events'))
+        if not has_events:
+            # Пустая база - создаем актуальную схему целиком
+            await conn.run_sync(Base.metadata.create_all)
+            await _set_version(conn, LATEST_VERSION)
+            logger.info('Database schema created at version %s', LATEST_VERSION)
+            return
+
+        # База создана до появления миграций - это начальная схема
+        current = 1
+
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+
+        logger.info('Applying migration %s: %s', version, description)
+        for step in steps:
+            if isinstance(step, str):
+                await conn.execute(text(step))
+            else:
+                await step(conn)
+        await _set_version(conn, version)
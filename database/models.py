@@ -2,7 +2,7 @@ from typing import Annotated, Optional
 
 # from datetime import date
 
-from sqlalchemy import BigInteger, Column, Date, ForeignKey, Table, MetaData
+from sqlalchemy import DDL, BigInteger, Column, Date, ForeignKey, Index, Table, MetaData, event, false, text
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -14,11 +14,22 @@ intpk = Annotated[int, mapped_column(primary_key=True)]
 # Модель мероприятия
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        # Все списки мероприятий выбираются по создателю
+        Index('ix_events_creator_id_id', 'creator_id', 'id'),
+        # Планировщик напоминаний выбирает мероприятия по диапазону дат
+        Index('ix_events_date_id', 'date', 'id'),
+    )
     
     id: Mapped[intpk]
     title: Mapped[str]
     date: Mapped[Date] = mapped_column(Date)
     creator_id = Column(BigInteger, nullable=False)
+    # Напоминание о мероприятии уже отправлено
+    reminded: Mapped[bool] = mapped_column(default=False, server_default=false())
+    # Число участников: поддерживается при добавлении и удалении
+    # участников, чтобы списки мероприятий не считали COUNT(*)
+    participant_count: Mapped[int] = mapped_column(default=0, server_default=text('0'))
     
     #Связь с участниками
     participants: Mapped[list["Participant"]] = relationship(
@@ -28,6 +39,17 @@ class Event(Base):
 # Модель участников
 class Participant(Base):
     __tablename__ = "participants"
+    __table_args__ = (
+        # Покрывает выборку участников мероприятия, удаление участника
+        # и каскадное удаление при удалении мероприятия
+        Index('ix_participants_event_id_id', 'event_id', 'id'),
+        # Поиск гостей по подстроке и похожести имени (только PostgreSQL)
+        Index(
+            'ix_participants_username_trgm', 'username',
+            postgresql_using='gin',
+            postgresql_ops={'username': 'gin_trgm_ops'},
+        ).ddl_if(dialect='postgresql'),
+    )
     
     id: Mapped[intpk]
     event_id: Mapped[int] = mapped_column(ForeignKey("events.id", ondelete="CASCADE"))
@@ -38,4 +60,21 @@ class Participant(Base):
     # Связь с мероприятием
     event: Mapped[list["Event"]] = relationship(
         back_populates="participants"
-    )
\ No newline at end of file
+    )
+
+
+# Класс операторов gin_trgm_ops дает расширение pg_trgm
+event.listen(
+    Participant.__table__,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'),
+)
+
+
+# Служебные значения бота (например, отпечаток команд меню),
+# чтобы при перезапуске не повторять запросы, если ничего не изменилось
+class BotMeta(Base):
+    __tablename__ = "bot_meta"
+    
+    key: Mapped[str] = mapped_column(primary_key=True)
+    value: Mapped[str]
@@ -0,0 +1,42 @@
+from datetime import date
+from typing import Any, NamedTuple
+
+
+# Легковесные записи для построения клавиатур.
+# Это обычные кортежи: без identity map и ORM-инструментирования.
+
+# Мероприятие в списках
+class EventRecord(NamedTuple):
+    id: int
+    title: str
+    participant_count: int = 0
+
+
+# Участник в списках
+class ParticipantRecord(NamedTuple):
+    id: int
+    username: str
+    event_id: int
+
+
+# Найденный гость и мероприятие, в котором он записан
+class SearchResultRecord(NamedTuple):
+    id: int
+    username: str
+    event_id: int
+    title: str
+
+
+# Мероприятие, о котором нужно напомнить создателю
+class ReminderRecord(NamedTuple):
+    id: int
+    title: str
+    date: date
+    creator_id: int
+
+
+# Страница списка при постраничном выводе
+class Page(NamedTuple):
+    items: tuple[Any, ...]
+    has_prev: bool
+    has_next: bool
@@ -0,0 +1,101 @@
+import re
+from collections import Counter
+from typing import Iterable, Optional
+
+from config_data.config import settings
+from .cache import DataVersions, TTLCache
+from .records import SearchResultRecord
+
+# Слова имени: как в pg_trgm, триграммы строятся по буквам и цифрам
+_WORDS = re.compile(r'\w+')
+
+
+# Триграммы строки по правилам pg_trgm: нижний регистр, каждое слово
+# дополняется двумя пробелами в начале и одним в конце
+def trigrams(value: str) -> set[str]:
+    result = set()
+    for word in _WORDS.findall(value.lower()):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+# Сходство строк как similarity() в pg_trgm: доля общих триграмм
+def similarity(left: set[str], right: set[str]) -> float:
+    if not left or not right:
+        return 0.0
+    common = len(left & right)
+    return common / (len(left) + len(right) - common)
+
+
+# Индекс поиска гостей в памяти процесса - замена GIN-индекса pg_trgm
+# для баз без этого расширения (SQLite в тестах и бенчмарках).
+# Строится по всем участникам мероприятий одного создателя:
+# триграмма -> ID участников. Поиск ищет кандидатов по общим триграммам
+# и подстроке и сортирует их по сходству так же, как запрос к PostgreSQL.
+class TrigramIndex:
+    def __init__(self, rows: Iterable[SearchResultRecord]):
+        self._rows: dict[int, SearchResultRecord] = {}
+        self._trigrams: dict[int, set[str]] = {}
+        self._postings: dict[str, list[int]] = {}
+
+        for row in rows:
+            grams = trigrams(row.username)
+            self._rows[row.id] = row
+            self._trigrams[row.id] = grams
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(row.id)
+
+    def search(self, query: str, limit: int, threshold: float) -> list[SearchResultRecord]:
+        needle = query.lower()
+        query_grams = trigrams(query)
+
+        # Кандидаты - участники хотя бы с одной общей триграммой
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self._postings.get(gram, ()))
+
+        scored = []
+        candidates = self._rows if len(needle) < 3 else shared
+        for participant_id in candidates:
+            row = self._rows[participant_id]
+            score = similarity(query_grams, self._trigrams[participant_id])
+            if score >= threshold or needle in row.username.lower():
+                scored.append((-score, participant_id))
+
+        scored.sort()
+        return [self._rows[participant_id] for _, participant_id in scored[:limit]]
+
+
+# Индексы поиска по ID создателя. Изменение участников создателя
+# меняет его версию (как в DataVersions для списков мероприятий),
+# и его индекс строится заново при следующем поиске; индексы
+# остальных создателей остаются в кэше.
+class SearchIndexCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self._indexes = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions = DataVersions(maxsize=maxsize)
+
+    def version(self, creator_id: int) -> int:
+        return self._versions.get(creator_id)
+
+    def get(self, creator_id: int) -> Optional[TrigramIndex]:
+        return self._indexes.get((creator_id, self.version(creator_id)))
+
+    # version - версия, полученная до чтения участников из базы: если
+    # участники за это время изменились, индекс уже не будет найден
+    def set(self, creator_id: int, version: int, index: TrigramIndex) -> None:
+        self._indexes.set((creator_id, version), index)
+
+    def invalidate(self, creator_id: int) -> None:
+        self._indexes.invalidate((creator_id, self.version(creator_id)))
+        self._versions.bump(creator_id)
+
+    def stats(self) -> dict[str, int]:
+        return self._indexes.stats()
+
+
+search_indexes = SearchIndexCache(
+    maxsize=settings.SEARCH_INDEX_CACHE_SIZE,
+    ttl=settings.EVENTS_CACHE_TTL,
+)
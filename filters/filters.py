@@ -1,10 +1,29 @@
 
+from typing import Any, Union
+
 from aiogram.filters import BaseFilter
 from aiogram.types import CallbackQuery
 
+from keyboards.callback_factory import UserActionCall
+
 
-class IsDelBookmarkCallbackData(BaseFilter):
-    async def __call__(self, callback: CallbackQuery) -> bool:
-        return callback.data.endswith('del') and callback.data[:-3].isdigit()
+# Пропускает нажатия кнопок с данными UserActionCall и передает
+# хэндлеру разобранные данные в аргументе callback_data.
+# Данные разбираются один раз на нажатие, старый строковый формат
+# кнопок из уже отправленных сообщений тоже поддерживается.
+class IsUserAction(BaseFilter):
+    async def __call__(self, callback: CallbackQuery) -> Union[bool, dict[str, Any]]:
+        data = callback.data
+        if not data:
+            return False
 
+        if data.startswith(UserActionCall.__prefix__ + UserActionCall.__separator__):
+            try:
+                return {'callback_data': UserActionCall.unpack(data)}
+            except (TypeError, ValueError):
+                return False
 
+        callback_data = UserActionCall.from_legacy(data)
+        if callback_data is None:
+            return False
+        return {'callback_data': callback_data}
@@ -0,0 +1,2 @@
+from .fake_redis import FakeRedis
+from .storage import PipelinedRedisStorage, create_storage
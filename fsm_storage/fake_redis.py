@@ -0,0 +1,86 @@
+from time import monotonic
+from typing import Any, Optional, Union
+
+
+# Внутрипроцессная замена Redis для тестов и локального запуска.
+# Поддерживает только те команды, которые использует PipelinedRedisStorage:
+# get, set (с ex), delete и pipeline.
+class FakeRedis:
+    def __init__(self):
+        self._data: dict[str, tuple[Optional[float], bytes]] = {}
+
+        # Количество "сетевых" обращений - удобно проверять в тестах
+        self.round_trips = 0
+
+    def _get(self, name: str) -> Optional[bytes]:
+        item = self._data.get(name)
+        if item is None:
+            return None
+
+        expires_at, value = item
+        if expires_at is not None and expires_at < monotonic():
+            del self._data[name]
+            return None
+        return value
+
+    def _set(self, name: str, value: Union[str, bytes], ex: Optional[int] = None) -> bool:
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        expires_at = monotonic() + ex if ex else None
+        self._data[name] = (expires_at, value)
+        return True
+
+    def _delete(self, *names: str) -> int:
+        return sum(self._data.pop(name, None) is not None for name in names)
+
+    async def get(self, name: str) -> Optional[bytes]:
+        self.round_trips += 1
+        return self._get(name)
+
+    async def set(self, name: str, value: Union[str, bytes], ex: Optional[int] = None) -> bool:
+        self.round_trips += 1
+        return self._set(name, value, ex)
+
+    async def delete(self, *names: str) -> int:
+        self.round_trips += 1
+        return self._delete(*names)
+
+    def pipeline(self, transaction: bool = True) -> 'FakePipeline':
+        return FakePipeline(self)
+
+    async def aclose(self, close_connection_pool: Optional[bool] = None) -> None:
+        pass
+
+
+# Пайплайн копит команды и выполняет их за одно обращение
+class FakePipeline:
+    def __init__(self, redis: FakeRedis):
+        self._redis = redis
+        self._commands: list[tuple[str, tuple[Any, ...], dict[str, Any]]] = []
+
+    async def __aenter__(self) -> 'FakePipeline':
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        self._commands.clear()
+
+    def get(self, name: str) -> 'FakePipeline':
+        self._commands.append(('_get', (name,), {}))
+        return self
+
+    def set(self, name: str, value: Union[str, bytes], ex: Optional[int] = None) -> 'FakePipeline':
+        self._commands.append(('_set', (name, value), {'ex': ex}))
+        return self
+
+    def delete(self, *names: str) -> 'FakePipeline':
+        self._commands.append(('_delete', names, {}))
+        return self
+
+    async def execute(self) -> list[Any]:
+        self._redis.round_trips += 1
+        results = [
+            getattr(self._redis, command)(*args, **kwargs)
+            for command, args, kwargs in self._commands
+        ]
+        self._commands.clear()
+        return results
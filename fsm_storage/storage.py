@@ -0,0 +1,168 @@
+import json
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config_data.config import settings
+from .fake_redis import FakeRedis
+
+
+# Состояние и данные одного ключа FSM, загруженные в рамках апдейта
+class _Record:
+    __slots__ = ('state', 'data', 'state_changed', 'data_changed')
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any]):
+        self.state = state
+        self.data = data
+        self.state_changed = False
+        self.data_changed = False
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return value
+
+
+# Хранилище FSM поверх Redis (или совместимого клиента).
+# Состояние и данные читаются одним пайплайном, а внутри batch()
+# все изменения копятся в памяти и записываются одним пайплайном
+# по окончании обработки апдейта.
+# Формат ключей совпадает с aiogram RedisStorage.
+class PipelinedRedisStorage(BaseStorage):
+    def __init__(
+        self,
+        redis: Any,
+        key_builder: Optional[KeyBuilder] = None,
+        state_ttl: Optional[int] = None,
+        data_ttl: Optional[int] = None,
+    ):
+        self.redis = redis
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self.state_ttl = state_ttl
+        self.data_ttl = data_ttl
+        self._batch: ContextVar[Optional[Dict[StorageKey, _Record]]] = ContextVar(
+            'fsm_batch', default=None
+        )
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> 'PipelinedRedisStorage':
+        try:
+            from redis.asyncio import Redis
+        except ImportError as e:
+            raise RuntimeError('Для FSM_STORAGE=redis установите пакет redis') from e
+        return cls(redis=Redis.from_url(url), **kwargs)
+
+    # Открывает буфер изменений на время обработки одного апдейта
+    @asynccontextmanager
+    async def batch(self) -> AsyncIterator[None]:
+        if self._batch.get() is not None:
+            yield
+            return
+
+        token = self._batch.set({})
+        try:
+            yield
+        finally:
+            records = self._batch.get()
+            self._batch.reset(token)
+            await self._flush(records)
+
+    async def _load(self, key: StorageKey) -> _Record:
+        records = self._batch.get()
+        if records is not None and key in records:
+            return records[key]
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(self.key_builder.build(key, 'state'))
+            pipe.get(self.key_builder.build(key, 'data'))
+            state, data = await pipe.execute()
+
+        record = _Record(
+            state=_decode(state),
+            data=json.loads(data) if data is not None else {},
+        )
+        if records is not None:
+            records[key] = record
+        return record
+
+    async def _flush(self, records: Dict[StorageKey, _Record]) -> None:
+        changed = [
+            (key, record) for key, record in records.items()
+            if record.state_changed or record.data_changed
+        ]
+        if not changed:
+            return
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, record in changed:
+                if record.state_changed:
+                    self._write_state(pipe, key, record.state)
+                if record.data_changed:
+                    self._write_data(pipe, key, record.data)
+            await pipe.execute()
+
+    def _write_state(self, client: Any, key: StorageKey, state: Optional[str]) -> Any:
+        redis_key = self.key_builder.build(key, 'state')
+        if state is None:
+            return client.delete(redis_key)
+        return client.set(redis_key, state, ex=self.state_ttl)
+
+    def _write_data(self, client: Any, key: StorageKey, data: Dict[str, Any]) -> Any:
+        redis_key = self.key_builder.build(key, 'data')
+        if not data:
+            return client.delete(redis_key)
+        return client.set(redis_key, json.dumps(data), ex=self.data_ttl)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+
+        if self._batch.get() is None:
+            await self._write_state(self.redis, key, state)
+            return
+
+        record = await self._load(key)
+        record.state = state
+        record.state_changed = True
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await self._load(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        if self._batch.get() is None:
+            await self._write_data(self.redis, key, data)
+            return
+
+        record = await self._load(key)
+        record.data = data.copy()
+        record.data_changed = True
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await self._load(key)
+        return record.data.copy()
+
+    async def close(self) -> None:
+        await self.redis.aclose(close_connection_pool=True)
+
+
+# Создает хранилище FSM, выбранное в настройках
+def create_storage() -> BaseStorage:
+    if settings.FSM_STORAGE == 'memory':
+        return MemoryStorage()
+
+    options = {
+        'state_ttl': settings.FSM_STATE_TTL or None,
+        'data_ttl': settings.FSM_DATA_TTL or None,
+    }
+
+    if settings.FSM_STORAGE == 'redis':
+        return PipelinedRedisStorage.from_url(settings.REDIS_URL, **options)
+    if settings.FSM_STORAGE == 'inprocess':
+        return PipelinedRedisStorage(FakeRedis(), **options)
+
+    raise ValueError(f'Неизвестное хранилище FSM: {settings.FSM_STORAGE}')
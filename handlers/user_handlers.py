@@ -1,27 +1,49 @@
+import io
+import os
 from datetime import datetime
+from typing import Optional
 
 from aiogram import F, Router
-from aiogram.filters import Command, CommandStart, StateFilter
-from aiogram.types import Message, CallbackQuery
+from aiogram.filters import Command, CommandObject, CommandStart, StateFilter
+from aiogram.types import CallbackQuery, FSInputFile, Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import default_state
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from database.records import ReminderRecord
 
+
+from config_data.config import settings
+from filters.filters import IsUserAction
 from states import AddEvent, AddParticipant
 from lexicon.lexicon import LEXICON
+from services import (EXPORT_FORMATS, ParticipantsExportError, ParticipantsFileError,
+                      ReminderScheduler, export_participants, parse_participant_names,
+                      parse_participants_file)
 
-from keyboards.keyboards import (create_delete_events_kb, create_delete_participants_kb,
+from keyboards.callback_factory import ActionDispatcher, UserAction, UserActionCall
+from keyboards.keyboards import (EVENTS_PAGE_KEYBOARDS, PARTICIPANTS_PAGE_KEYBOARDS,
+                                create_delete_events_kb, create_delete_participants_kb,
                                 create_events_keyboard, create_my_events_for_participant_keyboard,
                                 create_my_events_keyboard, create_participant_keyboard, 
-                                create_choice_kb, delete_event_or_participant) 
+                                create_choice_kb, create_search_results_keyboard,
+                                delete_event_or_participant) 
 
 from database.crud import (create_event, delete_events, delete_participants, edit_events, 
-                            get_events, create_participants, get_participants_for_event)
+                            get_events_page, create_participants, get_participants_page,
+                            search_participants, stream_participants)
 
 
 router = Router()
 
+# Хэндлеры нажатий на инлайн-кнопки регистрируются по действию
+# UserAction в таблице actions (см. process_user_action в конце модуля).
+actions = ActionDispatcher()
+
+# Хэндлеры нажатий на инлайн-кнопки возвращают callback.answer(), а не
+# вызывают его: в режиме вебхука ответ уходит в теле ответа Telegram,
+# а при polling aiogram выполнит возвращенный метод сам.
+
 
 # Этот хэндлер будет срабатывать на команду "/start"
 @router.message(CommandStart())
@@ -97,7 +119,8 @@ async def warning_not_event_name(message: Message):
 # Этот хэндлер срабатывает, если введена корректная дата,
 # а также обработка исключений.
 @router.message(StateFilter(AddEvent.event_date))
-async def process_event_date_sent(message: Message, session: AsyncSession, state: FSMContext):
+async def process_event_date_sent(message: Message, session: AsyncSession, state: FSMContext,
+                                  reminders: Optional[ReminderScheduler] = None):
     try:
         # Проверка, если сообщение не текстовое (например, гиф или видео)
         if message.text is None:
@@ -107,9 +130,6 @@ async def process_event_date_sent(message: Message, session: AsyncSession, state
         event_date_str = message.text
         event_date = datetime.strptime(event_date_str, '%d/%m/%Y').date()
 
-        # Сохраняем дату в хранилище по ключу "event_date"
-        await state.update_data(event_date=event_date)
-
         # Извлекаем данные из состояния для получения имени мероприятия 
         data = await state.get_data()
         event_name = data.get('event_name')
@@ -119,7 +139,11 @@ async def process_event_date_sent(message: Message, session: AsyncSession, state
         
 
         # Сохраняем событие в базе данных
-        await create_event(session, event_name, event_date, creator_id)
+        event_id = await create_event(session, event_name, event_date, creator_id)
+        
+        # Мероприятие может быть уже скоро - сообщаем планировщику напоминаний
+        if reminders is not None:
+            reminders.add_event(ReminderRecord(event_id, event_name, event_date, creator_id))
         
         await message.answer(
             text=LEXICON['event_saved']
@@ -143,9 +167,7 @@ async def process_edit_press(message: Message, session: AsyncSession):
     creator_id = message.from_user.id
     
     # Получаем события из базы данных
-    events = await get_events(session, creator_id)
-    
-    # events = [await session.merge(event) for event in events]
+    events = await get_events_page(session, creator_id)
     
 
     # Создаем клавиатуру с мероприятиями
@@ -156,11 +178,8 @@ async def process_edit_press(message: Message, session: AsyncSession):
 
 
 # Этот хэндлер срабатывает на кнопку "Изменить"
-@router.callback_query(F.data == 'edit_events')
-async def process_edit_events_press(callback: CallbackQuery, session: AsyncSession):
-    
-    creator_id = callback.from_user.id
-    del_events = await get_events(session, creator_id)
+@actions.register(UserAction.EDIT_EVENTS)
+async def process_edit_events_press(callback: CallbackQuery):
     
     await callback.message.edit_text(
         text=LEXICON['delete_events_info'],
@@ -168,93 +187,98 @@ async def process_edit_events_press(callback: CallbackQuery, session: AsyncSessi
         # reply_markup=create_delete_events_kb(del_events)
     )
     
-    await callback.answer()
+    return callback.answer()
 
 # Этот хэндлер срабатывает на кнопку "❌ Мероприятие"
 # и выдает список мероприятий к удалению.
-@router.callback_query(F.data == 'delete_event')
+@actions.register(UserAction.DELETE_EVENT_MENU)
 async def process_event_delete(callback: CallbackQuery, session: AsyncSession):
     
     creator_id = callback.from_user.id
-    del_events = await get_events(session, creator_id)
+    del_events = await get_events_page(session, creator_id)
     
     await callback.message.edit_text(
         text=f'❌ Вы моежете удалить мероприятие',
         reply_markup=create_delete_events_kb(del_events)
     )
     
-    await callback.answer()
+    return callback.answer()
 
 
 # Этот хэндлер срабатывает на кнопку "❌ Участников"
 # и выдает список мероприятий к удалению.
-@router.callback_query(F.data == 'delete_participant')
+@actions.register(UserAction.DELETE_PARTICIPANT_MENU)
 async def process_participant_delete(callback: CallbackQuery, session: AsyncSession):
     
     creator_id = callback.from_user.id
-    events = await get_events(session, creator_id)
+    events = await get_events_page(session, creator_id)
     
     await callback.message.edit_text(
         text=f'Выберите мероприятия для продолжения',
         reply_markup=create_my_events_for_participant_keyboard(events)
     )
     
-    await callback.answer()
+    return callback.answer()
 
 
-@router.callback_query(F.data.startswith("del_participant_for_event:"))
-async def process_del_participant_for_event(callback: CallbackQuery, session: AsyncSession):
+# Этот хэндлер срабатывает на выбор мероприятия
+# и выдает список его участников к удалению.
+@actions.register(UserAction.PARTICIPANTS_FOR_DELETE)
+async def process_del_participant_for_event(callback: CallbackQuery, callback_data: UserActionCall,
+                                            session: AsyncSession):
     
-    event_id = int(callback.data.split(':')[1])
+    event_id = callback_data.id
     
     # Запрашиваем из базы данных участников, созданные пользователем
-    del_participants = await get_participants_for_event(session, event_id)
+    del_participants = await get_participants_page(session, event_id)
     
     await callback.message.edit_text(
         text=f'❌ Вы можете удалить участников',
         reply_markup=create_delete_participants_kb(del_participants)
     )
     
-    await callback.answer()
+    return callback.answer()
 
 
-@router.callback_query(F.data.startswith("participant_delete:"))
-async def process_participant_delete_press(callback: CallbackQuery, session: AsyncSession):
+# Этот хэндлер срабатывает на кнопку удаления участника.
+@actions.register(UserAction.PARTICIPANT_DELETE)
+async def process_participant_delete_press(callback: CallbackQuery, callback_data: UserActionCall,
+                                           session: AsyncSession):
     
-    data_parts = callback.data.split(':')
-    participant_id, event_id = data_parts[1], data_parts[2]
+    event_id = callback_data.event_id
     
-    await delete_participants(session, int(participant_id), int(event_id))
-    
-    updated_participants = await get_participants_for_event(session, int(event_id))
+    # Удаляем участника и получаем ту же страницу участников одним запросом
+    updated_participants = await delete_participants(
+        session, callback.from_user.id, callback_data.id, event_id, callback_data.cursor
+    )
     
     # Обновляем клавиатуру с новыми данными
     await callback.message.edit_text(
         text=LEXICON['participant_deleted'],
         reply_markup=create_delete_participants_kb(updated_participants)
     )
-    await callback.answer()
+    return callback.answer()
 
 
 # Этот хэндлер срабатывает на кнопку "Назад"
 # этого хэндлера "process_edit_events_press".
-@router.callback_query(F.data == 'back_participant_delete')
+@actions.register(UserAction.BACK_TO_DELETE_MENU)
 async def process_back_participant_delete(callback: CallbackQuery):
 
     await callback.message.edit_text(
         text=LEXICON['delete_events_info'],
         reply_markup=delete_event_or_participant()
     )
-    await callback.answer()
+    return callback.answer()
 
 
 # Этот хэндлер срабатывает на инлайн-кнопку "❌ Отмена"
 # и отображает список мероприятий.
-@router.callback_query(F.data == 'cancel_delete')
+@actions.register(UserAction.CANCEL_DELETE)
 async def process_cansel_delete_press(callback: CallbackQuery, session: AsyncSession):
     
     creator_id = callback.from_user.id
-    events = await get_events(session, creator_id)
+    events = await get_events_page(session, creator_id)
     
     
     await callback.message.edit_text(
@@ -262,41 +286,41 @@ async def process_cansel_delete_press(callback: CallbackQuery, session: AsyncSes
         reply_markup=create_events_keyboard(events)
     )
     
-    await callback.answer()
+    return callback.answer()
 
 
 # Этот хэндлер срабатывает на кнопку удаления мероприятия
 # и предлагает дальнейшие действия.
-@router.callback_query(F.data.startswith("event_delete:"))
-async def process_delete_press(callback: CallbackQuery, session: AsyncSession):
+@actions.register(UserAction.EVENT_DELETE)
+async def process_delete_press(callback: CallbackQuery, callback_data: UserActionCall,
+                               session: AsyncSession):
     
-    # Извлекаем ID мероприятия из callback-данных
-    event_id = int(callback.data.split(':')[1])
+    # Извлекаем ID мероприятия и курсор страницы из callback-данных
+    event_id, cursor = callback_data.id, callback_data.cursor
     
     # Получаем id пользователя
     creator_id = callback.from_user.id
     
-    await delete_events(session, creator_id, event_id)
-    
-    # Получаем обновленный список мероприятий
-    del_events = await get_events(session, creator_id)
+    # Удаляем мероприятие и получаем обновленную страницу списка одним запросом
+    del_events = await delete_events(session, creator_id, event_id, cursor)
     
     await callback.message.edit_text(
         text=LEXICON['event_delete'],
         reply_markup=create_delete_events_kb(del_events)
     )
     
-    await callback.answer()
+    return callback.answer()
 
 
 # Этот хэндлер срабатывает при выборе мероприятия командой "/edit_events".
 # Он отправляет пользователю клавиатуру с вариантами дальнейших действий:
 # вернуться назад или добавить пользователя.
-@router.callback_query(F.data.startswith("event_edit:"))
-async def process_event_press(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
+@actions.register(UserAction.EVENT_EDIT)
+async def process_event_press(callback: CallbackQuery, callback_data: UserActionCall,
+                              session: AsyncSession, state: FSMContext):
     
     # Извлекаем ID мероприятия из callback-данных
-    event_id = int(callback.data.split(':')[1])
+    event_id = callback_data.id
 
     event = await edit_events(session, event_id)
     
@@ -307,31 +331,35 @@ async def process_event_press(callback: CallbackQuery, session: AsyncSession, st
         text=f'{LEXICON["event_selected"]} {event.title}',
         reply_markup=create_choice_kb(event)
     )
-    await callback.answer()
+    return callback.answer()
 
 
 # Этот хэндлер будет срабатывать на кнопку "Назад"
 # и возвращать прошлое сообщение
-@router.callback_query(F.data == 'choice_back')
+@actions.register(UserAction.CHOICE_BACK)
 async def process_choice_back_press(callback: CallbackQuery, session: AsyncSession):
     # Получаем ID пользователя (создателя мероприятий)
     creator_id = callback.from_user.id
 
     # Загружаем список мероприятий пользователя
-    events = await get_events(session, creator_id)
+    events = await get_events_page(session, creator_id)
 
     # Обновляем сообщение (меняем текст + клавиатуру)
     await callback.message.edit_text(
         text=LEXICON['events_info'],
         reply_markup=create_events_keyboard(events)
     )
-    await callback.answer()
+    return callback.answer()
 
 
 # Этот хэндлер будет срабатывать на кнопку "Добавить"
 # и переводить в состояние ожидания ввода имени участника.
-@router.callback_query(F.data == 'add', StateFilter(default_state))
-async def process_add_press(callback: CallbackQuery, state: FSMContext):
+@actions.register(UserAction.ADD)
+async def process_add_press(callback: CallbackQuery, state: FSMContext, raw_state: str | None):
+    
+    # Добавлять участника можно только вне других сценариев
+    if raw_state is not None:
+        return callback.answer()
     
     prompt_message = await callback.message.edit_text(
         text=LEXICON['enter_participant_name']
@@ -343,13 +371,24 @@ async def process_add_press(callback: CallbackQuery, state: FSMContext):
     # Устанавливаем состояние ожидания ввода имени участника
     await state.set_state(AddParticipant.participant_name)
     
-    await callback.answer()
+    return callback.answer()
 
 
-# Этот хэндлер будет срабатывать, если введено корректное имя
-# участника. # (и переводить в состояние ожидания ввода статуса, пока что не сделано)
-@router.message(StateFilter(AddParticipant.participant_name))
-async def process_alias_sent(message: Message, session: AsyncSession, state: FSMContext):
+# Сохраняет участников, присланных в состоянии ожидания имени,
+# и завершает машину состояний.
+async def save_participants(message: Message, session: AsyncSession, state: FSMContext,
+                            participant_names: list[str]):
+    if not participant_names:
+        await message.answer(text=LEXICON['warning_not_participant_name'])
+        return
+    
+    if len(participant_names) > settings.PARTICIPANTS_IMPORT_LIMIT:
+        await message.answer(
+            text=LEXICON['warning_participants_limit'].format(
+                limit=settings.PARTICIPANTS_IMPORT_LIMIT
+            )
+        )
+        return
     
     # Получаем ID сохраненного сообщения с запросом
     data = await state.get_data()
@@ -359,25 +398,64 @@ async def process_alias_sent(message: Message, session: AsyncSession, state: FSM
     if prompt_message_id:
         await message.bot.delete_message(chat_id=message.chat.id, message_id=prompt_message_id)
     
-    # Cохраняем введенное имя в хранилище по ключу "participant_name"
-    await state.update_data(participant_name=message.text)
-
-    # Извлекаем данные из состояния
-    data = await state.get_data()
-    participant_name = data.get('participant_name')
+    # ID мероприятия берем из данных состояния
     event_id = data.get('event_id')
     
+    # Сохраняем участников в бд одним запросом
+    added = await create_participants(session, event_id, participant_names)
     
-    # Сохраняем участника в бд
-    await create_participants(session, event_id, participant_name)
-    
-    await message.answer(
-        text=LEXICON['participant_added']
-    )
+    if len(participant_names) == 1 and added:
+        text = LEXICON['participant_added']
+    else:
+        text = LEXICON['participants_added'].format(
+            added=len(added),
+            skipped=len(participant_names) - len(added),
+        )
+    await message.answer(text=text)
 
     await state.clear()
 
 
+# Этот хэндлер будет срабатывать, если прислан файл со списком
+# участников (CSV или TXT).
+@router.message(StateFilter(AddParticipant.participant_name), F.document)
+async def process_participants_file_sent(message: Message, session: AsyncSession, state: FSMContext):
+    
+    document = message.document
+    if document.file_size and document.file_size > settings.PARTICIPANTS_IMPORT_FILE_SIZE:
+        await message.answer(
+            text=LEXICON['warning_participants_file'].format(
+                size=settings.PARTICIPANTS_IMPORT_FILE_SIZE // 1024
+            )
+        )
+        return
+    
+    content = io.BytesIO()
+    await message.bot.download(document, destination=content)
+    
+    try:
+        participant_names = parse_participants_file(content.getvalue(), document.file_name or '')
+    except ParticipantsFileError:
+        await message.answer(
+            text=LEXICON['warning_participants_file'].format(
+                size=settings.PARTICIPANTS_IMPORT_FILE_SIZE // 1024
+            )
+        )
+        return
+    
+    await save_participants(message, session, state, participant_names)
+
+
+# Этот хэндлер будет срабатывать, если введены имена участников:
+# одно имя или несколько - по одному в строке или через запятую.
+@router.message(StateFilter(AddParticipant.participant_name))
+async def process_alias_sent(message: Message, session: AsyncSession, state: FSMContext):
+    
+    participant_names = parse_participant_names(message.text or '')
+    
+    await save_participants(message, session, state, participant_names)
+
+
 # Этот хэндлер срабатывает на команду "/my_events" 
 # и выдает список ранее созданных мероприятий.
 @router.message(Command(commands='my_events'))
@@ -387,9 +465,7 @@ async def process_my_events_command(message: Message, session: AsyncSession):
     creator_id = message.from_user.id 
 
     # Запрашиваем из базы данных мероприятия, созданные пользователем
-    events = await get_events(session, creator_id)
-    
-    events = [await session.merge(event) for event in events]
+    events = await get_events_page(session, creator_id)
     
     # Отправляем пользователю список его мероприятий с кнопками
     await message.answer(
@@ -400,21 +476,22 @@ async def process_my_events_command(message: Message, session: AsyncSession):
 
 # Этот хэндлер срабатывает на инлайн-кнопку созданного мероприятия
 # и выдает список участников, ранее записанных в мероприятие команды "/my_events".
-@router.callback_query(F.data.startswith("event:"))
-async def process_def_event_press(callback: CallbackQuery, session: AsyncSession):
+@actions.register(UserAction.EVENT)
+async def process_def_event_press(callback: CallbackQuery, callback_data: UserActionCall,
+                                  session: AsyncSession):
     
     # Извлекаем ID мероприятия из callback-данных
-    event_id = int(callback.data.split(':')[1])
+    event_id = callback_data.id
     
     # Запрашиваем из базы данных участников, созданные пользователем
-    participant = await get_participants_for_event(session, event_id)
+    participant = await get_participants_page(session, event_id)
     
     # Отправляем пользователю список участников с кнопками
     await callback.message.edit_text(
         text=f'😇 <b>Участники мероприятия:</b> 🎁',
         reply_markup=create_participant_keyboard(participant)
     )
-    await callback.answer()
+    return callback.answer()
 
 
 # Этот хэндлер срабатывает на инлайн-кнопку "Назад" функции process_def_event_press
@@ -423,13 +500,13 @@ async def process_def_event_press(callback: CallbackQuery, session: AsyncSession
 
 # Этот хэндлер срабатывает на инлайн-кнопку "Назад"
 # и возвращает пользователя на прошлое сообщение
-@router.callback_query(F.data =='home_back')
+@actions.register(UserAction.HOME_BACK)
 async def process_back_press(callback: CallbackQuery, session: AsyncSession):
     # Получаем ID пользователя
     creator_id = callback.from_user.id 
 
     # Загружаем список мероприятий пользователя
-    events = await get_events(session, creator_id)
+    events = await get_events_page(session, creator_id)
 
     # Изменяем текущее сообщение, обновляя текст и клавиатуру
     await callback.message.edit_text(
@@ -437,5 +514,120 @@ async def process_back_press(callback: CallbackQuery, session: AsyncSession):
         reply_markup=create_my_events_keyboard(events)
     )
 
-    await callback.answer()
+    return callback.answer()
+    
+
+
+# Этот хэндлер срабатывает на кнопки перехода между страницами
+# списков мероприятий и перерисовывает только клавиатуру.
+@actions.register(*EVENTS_PAGE_KEYBOARDS)
+async def process_events_page_press(callback: CallbackQuery, callback_data: UserActionCall,
+                                    session: AsyncSession):
     
+    page = await get_events_page(
+        session, callback.from_user.id, callback_data.cursor, backward=callback_data.back
+    )
+    
+    await callback.message.edit_reply_markup(
+        reply_markup=EVENTS_PAGE_KEYBOARDS[callback_data.action](page)
+    )
+    return callback.answer()
+
+
+# Этот хэндлер срабатывает на кнопки перехода между страницами
+# списков участников мероприятия.
+@actions.register(*PARTICIPANTS_PAGE_KEYBOARDS)
+async def process_participants_page_press(callback: CallbackQuery, callback_data: UserActionCall,
+                                          session: AsyncSession):
+    
+    page = await get_participants_page(
+        session, callback_data.event_id, callback_data.cursor, backward=callback_data.back
+    )
+    
+    await callback.message.edit_reply_markup(
+        reply_markup=PARTICIPANTS_PAGE_KEYBOARDS[callback_data.action](page)
+    )
+    return callback.answer()
+
+
+# Этот хэндлер срабатывает на кнопку с именем участника.
+# Действий с участником пока нет - просто убираем индикатор загрузки.
+@actions.register(UserAction.PARTICIPANT)
+async def process_participant_press(callback: CallbackQuery):
+    return callback.answer()
+
+
+# Выгружает участников мероприятий пользователя (или одного мероприятия)
+# в файл и отправляет его документом. Строки из базы сразу пишутся
+# во временный файл, так что размер списка не влияет на память.
+async def send_participants_export(message: Message, session: AsyncSession, creator_id: int,
+                                   event_id: Optional[int] = None, file_format: str = 'csv'):
+    try:
+        path, count = await export_participants(
+            stream_participants(session, creator_id, event_id), file_format
+        )
+    except ParticipantsExportError:
+        await message.answer(
+            text=LEXICON['warning_export_format'].format(formats=', '.join(EXPORT_FORMATS))
+        )
+        return
+    
+    try:
+        if not count:
+            await message.answer(text=LEXICON['export_empty'])
+            return
+        
+        filename = f'participants_{event_id}.{file_format}' if event_id else f'participants.{file_format}'
+        await message.answer_document(
+            document=FSInputFile(path, filename=filename),
+            caption=LEXICON['export_done'].format(count=count)
+        )
+    finally:
+        os.remove(path)
+
+
+# Этот хэндлер срабатывает на команду "/export" и выгружает
+# участников всех мероприятий пользователя: "/export" - в CSV,
+# "/export xlsx" - в Excel.
+@router.message(Command(commands='export'))
+async def process_export_command(message: Message, command: CommandObject, session: AsyncSession):
+    file_format = (command.args or 'csv').strip().lower()
+    await send_participants_export(message, session, message.from_user.id, file_format=file_format)
+
+
+# Этот хэндлер срабатывает на кнопку "Выгрузить" в списке
+# участников и отправляет список участников мероприятия в CSV.
+@actions.register(UserAction.EXPORT_PARTICIPANTS)
+async def process_export_press(callback: CallbackQuery, callback_data: UserActionCall,
+                               session: AsyncSession):
+    await send_participants_export(
+        callback.message, session, callback.from_user.id, callback_data.event_id
+    )
+    return callback.answer()
+
+
+# Этот хэндлер срабатывает на команду "/search имя" и ищет гостя
+# по части имени или похожему написанию во всех мероприятиях пользователя.
+@router.message(Command(commands='search'))
+async def process_search_command(message: Message, command: CommandObject, session: AsyncSession):
+    name = (command.args or '').strip()
+    if not name:
+        await message.answer(text=LEXICON['search_usage'])
+        return
+    
+    results = await search_participants(session, message.from_user.id, name)
+    if not results:
+        await message.answer(text=LEXICON['search_empty'])
+        return
+    
+    await message.answer(
+        text=LEXICON['search_results'].format(count=len(results)),
+        reply_markup=create_search_results_keyboard(results)
+    )
+
+
+# Единственный хэндлер инлайн-кнопок: данные кнопки разбираются
+# один раз фильтром IsUserAction, а хэндлер выбирается по действию.
+@router.callback_query(IsUserAction())
+async def process_user_action(callback: CallbackQuery, callback_data: UserActionCall, **data):
+    return await actions.dispatch(callback, callback_data, **data)
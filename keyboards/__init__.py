@@ -1,4 +1,5 @@
-from .callback_factory import UserAction, UserActionCall
+from .callback_factory import ActionDispatcher, UserAction, UserActionCall
 from .keyboards import (create_choice_kb,create_participant_keyboard, 
 create_events_keyboard, create_my_events_keyboard,
-create_delete_events_kb, delete_event_or_participant, create_delete_participants_kb, create_my_events_for_participant_keyboard)
\ No newline at end of file
+create_delete_events_kb, delete_event_or_participant, create_delete_participants_kb, create_my_events_for_participant_keyboard,
+create_search_results_keyboard)
\ No newline at end of file
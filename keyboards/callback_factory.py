@@ -0,0 +1,121 @@
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.filters.callback_data import CallbackData
+
+
+# Действия инлайн-кнопок. Значения входят в callback-данные,
+# поэтому уже выпущенные номера не меняются.
+class UserAction(IntEnum):
+    EDIT_EVENTS = 1
+    DELETE_EVENT_MENU = 2
+    DELETE_PARTICIPANT_MENU = 3
+    PARTICIPANTS_FOR_DELETE = 4
+    PARTICIPANT_DELETE = 5
+    BACK_TO_DELETE_MENU = 6
+    CANCEL_DELETE = 7
+    EVENT_DELETE = 8
+    EVENT_EDIT = 9
+    CHOICE_BACK = 10
+    ADD = 11
+    EVENT = 12
+    HOME_BACK = 13
+    PARTICIPANT = 14
+    EXPORT_PARTICIPANTS = 15
+
+    # Переходы между страницами списков
+    EDIT_EVENTS_PAGE = 20
+    MY_EVENTS_PAGE = 21
+    DELETE_EVENTS_PAGE = 22
+    PARTICIPANT_EVENTS_PAGE = 23
+    PARTICIPANTS_PAGE = 24
+    DELETE_PARTICIPANTS_PAGE = 25
+
+
+# Callback-данные инлайн-кнопок.
+# Префикс "u" + номер версии формата: при несовместимом изменении
+# полей версия увеличивается, а старые кнопки разбираются отдельно.
+# Упакованные данные выглядят как "u1:9:42:0:0:0" и укладываются
+# в лимит Telegram в 64 байта.
+class UserActionCall(CallbackData, prefix='u1'):
+    action: UserAction
+    id: int = 0
+    event_id: int = 0
+    cursor: int = 0
+    back: bool = False
+
+    # Разбирает callback-данные кнопок, созданных до появления фабрики
+    @classmethod
+    def from_legacy(cls, data: str) -> Optional['UserActionCall']:
+        action = LEGACY_ACTIONS.get(data)
+        if action is not None:
+            return cls(action=action)
+
+        prefix, _, rest = data.partition(':')
+        action = LEGACY_ID_ACTIONS.get(prefix)
+        if action is None:
+            return None
+
+        parts = rest.split(':')
+        if not all(part.isdigit() for part in parts):
+            return None
+        parts = [int(part) for part in parts]
+
+        if action == UserAction.PARTICIPANT_DELETE:
+            if len(parts) < 2:
+                return None
+            return cls(action=action, id=parts[0], event_id=parts[1], cursor=parts[2] if len(parts) > 2 else 0)
+        if action == UserAction.EVENT_DELETE and len(parts) > 1:
+            return cls(action=action, id=parts[0], cursor=parts[1])
+        return cls(action=action, id=parts[0])
+
+
+LEGACY_ACTIONS = {
+    'edit_events': UserAction.EDIT_EVENTS,
+    'delete_event': UserAction.DELETE_EVENT_MENU,
+    'delete_participant': UserAction.DELETE_PARTICIPANT_MENU,
+    'back_participant_delete': UserAction.BACK_TO_DELETE_MENU,
+    'cancel_delete': UserAction.CANCEL_DELETE,
+    'choice_back': UserAction.CHOICE_BACK,
+    'add': UserAction.ADD,
+    'home_back': UserAction.HOME_BACK,
+}
+
+LEGACY_ID_ACTIONS = {
+    'del_participant_for_event': UserAction.PARTICIPANTS_FOR_DELETE,
+    'participant_delete': UserAction.PARTICIPANT_DELETE,
+    'event_delete': UserAction.EVENT_DELETE,
+    'event_edit': UserAction.EVENT_EDIT,
+    'event': UserAction.EVENT,
+}
+
+
+# Таблица хэндлеров по действию: вместо перебора фильтров
+# F.data.startswith(...) хэндлер находится одним поиском в словаре.
+# Аргументы хэндлерам передаются так же, как в aiogram, - по именам.
+class ActionDispatcher:
+    def __init__(self):
+        self._handlers: dict[UserAction, CallableObject] = {}
+
+    def register(self, *actions: UserAction) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+        def decorator(callback: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+            handler = CallableObject(callback)
+            for action in actions:
+                if action in self._handlers:
+                    raise ValueError(f'Хэндлер для {action!r} уже зарегистрирован')
+                self._handlers[action] = handler
+            return callback
+        return decorator
+
+    # Имя функции-хэндлера действия (для метрик и логов)
+    def handler_name(self, action: UserAction) -> Optional[str]:
+        handler = self._handlers.get(action)
+        return handler.callback.__name__ if handler is not None else None
+
+    async def dispatch(self, event: Any, callback_data: UserActionCall, **data: Any) -> Any:
+        handler = self._handlers.get(callback_data.action)
+        if handler is None:
+            return UNHANDLED
+        return await handler.call(event, callback_data=callback_data, **data)
@@ -1,27 +1,96 @@
+from functools import wraps
+from typing import Callable, Optional
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from .callback_factory import UserAction, UserActionCall
+from config_data.config import settings
+from database.cache import TTLCache
+from database.records import EventRecord, Page, SearchResultRecord
 from lexicon.lexicon import LEXICON
 
 
+# Кэш готовых клавиатур списков. Ключ - (функция, страница): страница -
+# неизменяемый кортеж записей, поэтому одинаковые данные (та же версия
+# списка пользователя из events_cache) дают ту же клавиатуру, а любое
+# изменение списка - другой ключ. Клавиатуры не изменяются после создания,
+# поэтому один объект можно отдавать многим хэндлерам.
+keyboards_cache = TTLCache(
+    maxsize=settings.KEYBOARDS_CACHE_SIZE,
+    ttl=settings.EVENTS_CACHE_TTL,
+)
+
+
+def cached_keyboard(func: Callable[[Page], InlineKeyboardMarkup]) -> Callable[[Page], InlineKeyboardMarkup]:
+    @wraps(func)
+    def wrapper(page: Page) -> InlineKeyboardMarkup:
+        key = (func.__name__, page)
+        markup = keyboards_cache.get(key)
+        if markup is None:
+            markup = func(page)
+            keyboards_cache.set(key, markup)
+        return markup
+
+    return wrapper
+
+
+# Добавляет строку с кнопками перехода между страницами списка.
+# В callback передается курсор: id первой записи страницы для
+# перехода назад и id последней записи для перехода вперед.
+def add_page_buttons(kb_builder: InlineKeyboardBuilder, page: Page, action: UserAction,
+                     event_id: int = 0) -> None:
+    buttons = []
+    
+    if page.has_prev and page.items:
+        buttons.append(InlineKeyboardButton(
+            text=LEXICON['prev_page'],
+            callback_data=UserActionCall(
+                action=action, event_id=event_id, cursor=page.items[0].id, back=True
+            ).pack()
+        ))
+    if page.has_next and page.items:
+        buttons.append(InlineKeyboardButton(
+            text=LEXICON['next_page'],
+            callback_data=UserActionCall(
+                action=action, event_id=event_id, cursor=page.items[-1].id
+            ).pack()
+        ))
+    
+    if buttons:
+        kb_builder.row(*buttons)
+
+
+# Курсор, с которого можно заново получить текущую страницу
+def page_cursor(page: Page) -> int:
+    return page.items[0].id - 1 if page.items else 0
+
+
+# Название мероприятия с числом участников для кнопок списков
+def event_title(event: EventRecord) -> str:
+    return LEXICON['event_with_count'].format(title=event.title, count=event.participant_count)
+
+
 # Выдает список ранее созданых мероприятий
 # с кнопкой "Изменить"
-def create_events_keyboard(events) -> InlineKeyboardMarkup:
+@cached_keyboard
+def create_events_keyboard(page: Page) -> InlineKeyboardMarkup:
     kb_builder = InlineKeyboardBuilder()
 
-    for event in events:
+    for event in page.items:
         event_id = event.id
-        title = event.title
+        title = event_title(event)
         kb_builder.row(InlineKeyboardButton(
             text=title,
-            callback_data=f'event_edit:{event_id}'
+            callback_data=UserActionCall(action=UserAction.EVENT_EDIT, id=event_id).pack()
         ))
     
+    add_page_buttons(kb_builder, page, UserAction.EDIT_EVENTS_PAGE)
+    
     kb_builder.row(
         InlineKeyboardButton(
             text=LEXICON['edit_events_button'],
-            callback_data='edit_events'
+            callback_data=UserActionCall(action=UserAction.EDIT_EVENTS).pack()
         ),
         width=2
     )
@@ -29,18 +98,23 @@ def create_events_keyboard(events) -> InlineKeyboardMarkup:
     return kb_builder.as_markup()
 
 
-# Выдает клавиатуру с кнопкой "Назад" и "Добавить" - участников
-def create_choice_kb(event) -> InlineKeyboardMarkup:
+# Выдает клавиатуру с кнопкой "Назад" и "Добавить" - участников.
+# Клавиатура не зависит от мероприятия и строится один раз при импорте.
+def create_choice_kb(event: Optional[EventRecord] = None) -> InlineKeyboardMarkup:
+    return CHOICE_KB
+
+
+def _build_choice_kb() -> InlineKeyboardMarkup:
     kb_builder = InlineKeyboardBuilder()
     
     kb_builder.row(
         InlineKeyboardButton(
             text=LEXICON['back'],
-            callback_data='choice_back'
+            callback_data=UserActionCall(action=UserAction.CHOICE_BACK).pack()
         ),
         InlineKeyboardButton(
             text=LEXICON['add'],
-            callback_data='add'
+            callback_data=UserActionCall(action=UserAction.ADD).pack()
         ),
         width=2
     )
@@ -49,23 +123,26 @@ def create_choice_kb(event) -> InlineKeyboardMarkup:
 
 
 # Выдает список мероприятий
-def create_my_events_keyboard(events) -> InlineKeyboardMarkup:
+@cached_keyboard
+def create_my_events_keyboard(page: Page) -> InlineKeyboardMarkup:
     kb_builder = InlineKeyboardBuilder()
     
-    for event in events:
+    for event in page.items:
         event_id = event.id
-        title = event.title
+        title = event_title(event)
         kb_builder.row(
             InlineKeyboardButton(
                 text=title,
-                callback_data=f'event:{event_id}'
+                callback_data=UserActionCall(action=UserAction.EVENT, id=event_id).pack()
             )
         )
     
+    add_page_buttons(kb_builder, page, UserAction.MY_EVENTS_PAGE)
+    
     # kb_builder.row(
     #     InlineKeyboardButton(
     #         text=LEXICON['back'],
-    #         callback_data='back_participant_delete'
+    #         callback_data=UserActionCall(action=UserAction.BACK_TO_DELETE_MENU).pack()
     #     )
     # )
     
@@ -73,7 +150,8 @@ def create_my_events_keyboard(events) -> InlineKeyboardMarkup:
 
 
 # Выдает список участников
-def create_participant_keyboard(participants) -> InlineKeyboardMarkup:
+@cached_keyboard
+def create_participant_keyboard(page: Page) -> InlineKeyboardMarkup:
     # Создаем объект клавиатуры
     kb_builder = InlineKeyboardBuilder()
     
@@ -81,83 +159,122 @@ def create_participant_keyboard(participants) -> InlineKeyboardMarkup:
     buttons = [
         InlineKeyboardButton(
             text=participant.username,
-            callback_data=f'username:{participant.username}'
+            callback_data=UserActionCall(
+                action=UserAction.PARTICIPANT, id=participant.id, event_id=participant.event_id
+            ).pack()
         )
-        for participant in participants
+        for participant in page.items
     ]
 
     # Добавляем кнопки участников с шириной 2 (две колонки)
     kb_builder.row(*buttons, width=2)
+    
+    if page.items:
+        add_page_buttons(kb_builder, page, UserAction.PARTICIPANTS_PAGE, page.items[0].event_id)
 
     # Добавляем кнопку "Назад" отдельной строкой
-    kb_builder.row(InlineKeyboardButton(text=LEXICON['back'], callback_data='home_back'))
+    kb_builder.row(InlineKeyboardButton(text=LEXICON['back'], callback_data=UserActionCall(action=UserAction.HOME_BACK).pack()))
+    
+    # Кнопка выгрузки списка участников в файл
+    if page.items:
+        kb_builder.add(InlineKeyboardButton(
+            text=LEXICON['export_button'],
+            callback_data=UserActionCall(
+                action=UserAction.EXPORT_PARTICIPANTS, event_id=page.items[0].event_id
+            ).pack()
+        ))
 
     return kb_builder.as_markup()
 
 
 # Выдает список мероприятий к удалению
-def create_delete_events_kb(del_events) -> InlineKeyboardMarkup:
+@cached_keyboard
+def create_delete_events_kb(page: Page) -> InlineKeyboardMarkup:
     # Создаем объект клавиатуры
     kb_builder = InlineKeyboardBuilder()
     
-    for event in del_events:
+    # После удаления будет заново показана эта же страница
+    cursor = page_cursor(page)
+    
+    for event in page.items:
         event_id = event.id
         title = event.title
         kb_builder.row(InlineKeyboardButton(
             text=f'❌ {title}',
-            callback_data=f'event_delete:{event_id}'
+            callback_data=UserActionCall(
+                action=UserAction.EVENT_DELETE, id=event_id, cursor=cursor
+            ).pack()
         ))
     
+    add_page_buttons(kb_builder, page, UserAction.DELETE_EVENTS_PAGE)
+    
     # Добавляем кнопку "Отмена"
     kb_builder.row(
         InlineKeyboardButton(
             text="❌ Отмена",
-            callback_data='back_participant_delete'
+            callback_data=UserActionCall(action=UserAction.BACK_TO_DELETE_MENU).pack()
         )
     )
     
     return kb_builder.as_markup()
 
 
-def create_delete_participants_kb(del_participants) -> InlineKeyboardMarkup:
+@cached_keyboard
+def create_delete_participants_kb(page: Page) -> InlineKeyboardMarkup:
     kb_builder = InlineKeyboardBuilder()
     
+    # После удаления будет заново показана эта же страница
+    cursor = page_cursor(page)
+    
     # Заполняем список кнопками с именами участников
     buttons = [
         InlineKeyboardButton(
             text=f'❌ {participant.username}',
-            callback_data=f'participant_delete:{participant.id}:{participant.event_id}'
+            callback_data=UserActionCall(
+                action=UserAction.PARTICIPANT_DELETE,
+                id=participant.id,
+                event_id=participant.event_id,
+                cursor=cursor,
+            ).pack()
         )
-        for participant in del_participants
+        for participant in page.items
     ]
 
     # Добавляем кнопки участников с шириной 2 (две колонки)
     kb_builder.row(*buttons, width=2)
     
+    if page.items:
+        add_page_buttons(kb_builder, page, UserAction.DELETE_PARTICIPANTS_PAGE, page.items[0].event_id)
+    
     kb_builder.row(
             InlineKeyboardButton(
                 text="❌ Отмена",
-                callback_data='back_participant_delete'
+                callback_data=UserActionCall(action=UserAction.BACK_TO_DELETE_MENU).pack()
             )
     )
     return kb_builder.as_markup()
 
 
+# Меню удаления не зависит от данных и строится один раз при импорте
 def delete_event_or_participant() -> InlineKeyboardMarkup:
+    return DELETE_MENU_KB
+
+
+def _build_delete_menu_kb() -> InlineKeyboardMarkup:
     kb_builder = InlineKeyboardBuilder()
     
     kb_builder.row(
         InlineKeyboardButton(
             text=f'❌ Мероприятие',
-            callback_data='delete_event'
+            callback_data=UserActionCall(action=UserAction.DELETE_EVENT_MENU).pack()
         ),
         InlineKeyboardButton(
             text=f'❌ Участники',
-            callback_data='delete_participant'
+            callback_data=UserActionCall(action=UserAction.DELETE_PARTICIPANT_MENU).pack()
         ),
         InlineKeyboardButton(
             text="❌ Отмена",
-            callback_data='cancel_delete'
+            callback_data=UserActionCall(action=UserAction.CANCEL_DELETE).pack()
         ),
         width=2
     )
@@ -165,24 +282,60 @@ def delete_event_or_participant() -> InlineKeyboardMarkup:
     return kb_builder.as_markup()
 
 
-def create_my_events_for_participant_keyboard(events) -> InlineKeyboardMarkup:
+@cached_keyboard
+def create_my_events_for_participant_keyboard(page: Page) -> InlineKeyboardMarkup:
     kb_builder = InlineKeyboardBuilder()
     
-    for event in events:
+    for event in page.items:
         event_id = event.id
         title = event.title
         kb_builder.row(
             InlineKeyboardButton(
                 text=title,
-                callback_data=f'del_participant_for_event:{event_id}'
+                callback_data=UserActionCall(action=UserAction.PARTICIPANTS_FOR_DELETE, id=event_id).pack()
             )
         )
     
+    add_page_buttons(kb_builder, page, UserAction.PARTICIPANT_EVENTS_PAGE)
+    
     kb_builder.row(
         InlineKeyboardButton(
             text=LEXICON['back'],
-            callback_data='back_participant_delete'
+            callback_data=UserActionCall(action=UserAction.BACK_TO_DELETE_MENU).pack()
         )
     )
     
     return kb_builder.as_markup()
+
+
+# Выдает найденных гостей: кнопка открывает список участников
+# мероприятия, в котором записан гость
+def create_search_results_keyboard(results: list[SearchResultRecord]) -> InlineKeyboardMarkup:
+    kb_builder = InlineKeyboardBuilder()
+    
+    for result in results:
+        kb_builder.row(InlineKeyboardButton(
+            text=f'{result.username} · {result.title}',
+            callback_data=UserActionCall(action=UserAction.EVENT, id=result.event_id).pack()
+        ))
+    
+    return kb_builder.as_markup()
+
+
+CHOICE_KB = _build_choice_kb()
+DELETE_MENU_KB = _build_delete_menu_kb()
+
+
+# Клавиатуры постраничных списков по действию
+# кнопок перехода между страницами
+EVENTS_PAGE_KEYBOARDS = {
+    UserAction.EDIT_EVENTS_PAGE: create_events_keyboard,
+    UserAction.MY_EVENTS_PAGE: create_my_events_keyboard,
+    UserAction.DELETE_EVENTS_PAGE: create_delete_events_kb,
+    UserAction.PARTICIPANT_EVENTS_PAGE: create_my_events_for_participant_keyboard,
+}
+
+PARTICIPANTS_PAGE_KEYBOARDS = {
+    UserAction.PARTICIPANTS_PAGE: create_participant_keyboard,
+    UserAction.DELETE_PARTICIPANTS_PAGE: create_delete_participants_kb,
+}
@@ -1,8 +1,16 @@
+import hashlib
+import json
+import logging
+
 from aiogram import Bot
 from aiogram.types import BotCommand
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
+from database.crud import get_meta, set_meta
 from lexicon.lexicon import LEXICON_COMMANDS
 
+logger = logging.getLogger(__name__)
+
 
 # Функция для настройки кнопки Menu бота
 async def set_main_menu(bot: Bot):
@@ -12,4 +20,25 @@ async def set_main_menu(bot: Bot):
             description=description
         ) for command, description in LEXICON_COMMANDS.items()
     ]
-    await bot.set_my_commands(main_menu_commands)
\ No newline at end of file
+    await bot.set_my_commands(main_menu_commands)
+
+
+# Отпечаток списка команд меню
+def commands_fingerprint() -> str:
+    data = json.dumps(list(LEXICON_COMMANDS.items()), ensure_ascii=False)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+# Настраивает кнопку Menu, только если команды изменились с прошлого
+# запуска: отпечаток команд хранится в bot_meta для каждого бота.
+# При перезапуске с теми же командами запрос к Bot API не отправляется.
+async def update_main_menu(bot: Bot, session_pool: async_sessionmaker) -> None:
+    key = f'commands:{bot.id}'
+    fingerprint = commands_fingerprint()
+    
+    if await get_meta(session_pool(), key) == fingerprint:
+        return
+    
+    await set_main_menu(bot)
+    await set_meta(session_pool(), key, fingerprint)
+    logger.info('Bot commands updated')
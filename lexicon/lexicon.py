@@ -6,7 +6,9 @@ LEXICON: dict[str, str] = {
     '/help': '<b>Список доступных команд</b>:\n'
                 '/create_event - создать мероприятие\n'
                 '/my_events - мои пероприятия\n'
-                '/edit_events - изменить мероприятиe',
+                '/edit_events - изменить мероприятиe\n'
+                '/export - выгрузить списки участников (/export xlsx - в Excel)\n'
+                '/search имя - найти гостя во всех мероприятиях',
     
     'cansel': "<b>🚫 Вы вышли из процесса создания.</b>\n\n"
                 "🔄 Чтобы снова создать мероприятие, отправьте команду:\n"
@@ -59,19 +61,57 @@ LEXICON: dict[str, str] = {
                     "🔹 /my_events – мои мероприятия\n"
                     "🔹 /edit_events – изменить мероприятие",
     
+    'participants_added': '✅ <b>Добавлено участников: {added}</b> 🎉\n'
+                        'Пропущено повторов: {skipped}\n\n'
+                        'Посмотреть список можно командой /my_events. 🎁',
+    
+    'warning_not_participant_name': '<b>Не удалось найти имена участников.</b>\n\n'
+                        'Отправьте имена текстом или файлом CSV/TXT,\n'
+                        'либо прервите процесс командой /cansel_participant',
+    
+    'warning_participants_limit': '❌ <b>Слишком много участников за раз.</b>\n\n'
+                        'Можно добавить не больше {limit} имен в одном сообщении или файле.',
+    
+    'warning_participants_file': '❌ <b>Не удалось прочитать файл.</b>\n\n'
+                        'Поддерживаются текстовые файлы CSV/TXT в кодировке UTF-8 '
+                        'размером до {size} КБ.',
+    
     'enter_participant_name': '<b>Введите имя участника.</b>\n\n'
+                        '🔹 Можно добавить сразу несколько: по одному имени в строке '
+                        'или через запятую, а также прислать файл CSV/TXT.\n\n'
                         '🔹 Если захотите прервать процесс'
                         '– отправьте команду\n'
                         '📌 <b>/cansel_participant.</b>',
 
+    'event_reminder': '⏰ <b>Напоминание о мероприятии</b>\n\n'
+                        '🎉 <b>{title}</b> состоится <b>{date}</b>.\n\n'
+                        'Проверить список участников можно командой /my_events.',
+
+    'export_done': '📄 <b>Список участников</b>: {count}',
+    'export_empty': '🤷 <b>Участников для выгрузки пока нет.</b>',
+    'warning_export_format': '❌ <b>Не удалось выгрузить список.</b>\n\n'
+                        'Поддерживаются форматы: {formats}.',
+
+    'search_results': '🔎 <b>Найдено гостей: {count}</b>\n\n'
+                        'Нажмите на гостя, чтобы открыть список участников его мероприятия.',
+    'search_empty': '🤷 <b>Никого не нашлось.</b>\n\n'
+                        'Попробуйте часть имени или другое написание.',
+    'search_usage': '🔎 <b>Поиск гостя</b>\n\n'
+                        'Отправьте имя или его часть после команды, например:\n'
+                        '📌 <b>/search Анна</b>',
+
     'event_selected': '<b>Вы выбрали мероприятие:</b>',
+    'event_with_count': '{title} · 👥 {count}',
     'edit_events_button': '❌ Изменить',
     'online': 'Придет🟢',
     'unknown': 'Нет ответа🤷',
     'offline': 'Не придет🔴',
     'add': '📌 Добавить',
     'back': '⬅️ Назад',
-    'participant': '🙋‍♂️ Участники'
+    'prev_page': '◀️',
+    'next_page': '▶️',
+    'participant': '🙋‍♂️ Участники',
+    'export_button': '📄 Выгрузить'
 }
 
 LEXICON_COMMANDS: dict[str, str] = {
@@ -79,5 +119,7 @@ LEXICON_COMMANDS: dict[str, str] = {
     '/create_event': 'Создать мероприятие',
     '/my_events': 'Мои мероприятия',
     '/edit_events': 'Изменить мероприятиe',
+    '/export': 'Выгрузить списки участников',
+    '/search': 'Найти гостя',
 }
 
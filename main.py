@@ -1,23 +1,146 @@
 import asyncio
 import logging
+import signal
+from contextlib import suppress
+from typing import Optional
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from aiogram.fsm.storage.base import BaseStorage
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
 from database import create_engine, get_session_maker
 from database.database import init_models
-from middleware import DbSessionMiddleware
+from database.cache import events_cache
+from database.search import search_indexes
+from metrics import instrument_caches, instrument_engine, start_metrics_server
+from middleware import (DbSessionMiddleware, FSMBatchMiddleware, MetricsMiddleware,
+                        MetricsRequestMiddleware, OrderedUpdateMiddleware, OutboundRateLimiter,
+                        ThrottlingMiddleware, UnchangedEditFilter, UpdateExecutor)
+from fsm_storage import PipelinedRedisStorage, create_storage
 from config_data.config import settings
 from handlers import user_handlers, other_handlers
-from keyboards.main_menu import set_main_menu
+from services import CounterRepairJob, ReminderScheduler, ShutdownEvent
+from keyboards.keyboards import keyboards_cache
+from keyboards.main_menu import update_main_menu
+from sharding import run_sharded
+from webhook import run_shard_server, run_webhook
 
 # Инициализируем логгер
 logger = logging.getLogger(__name__)
 
 
-# Функция конфигурирования и запуска бота
-async def main():
+# Собирает диспетчер со всеми роутерами и middleware.
+# Используется и при запуске бота, и в бенчмарках (benchmarks/).
+def create_dispatcher(storage: BaseStorage, session_maker: async_sessionmaker,
+                      throttle_window: float = settings.THROTTLE_WINDOW,
+                      metrics: bool = settings.METRICS_ENABLED,
+                      executor: Optional[UpdateExecutor] = None) -> Dispatcher:
+    dp = Dispatcher(storage=storage)
+    
+    # Объединяем обращения к хранилищу FSM в один запрос на апдейт
+    if isinstance(storage, PipelinedRedisStorage):
+        FSMBatchMiddleware(storage).setup(dp)
+    
+    # Регистриуем роутеры в диспетчере
+    dp.include_router(user_handlers.router)
+    dp.include_router(other_handlers.router)
+    
+    # Отбрасываем повторные нажатия кнопок до обращения к базе данных
+    dp.callback_query.outer_middleware(ThrottlingMiddleware(
+        window=throttle_window,
+        max_keys=settings.THROTTLE_MAX_KEYS,
+    ))
+    
+    # Замеряем время апдейтов и хэндлеров (вместе с работой с сессией БД)
+    if metrics:
+        MetricsMiddleware(actions=user_handlers.actions).setup(dp)
+    
+    # Добавляем middleware для работы с базой данных
+    db_middleware = DbSessionMiddleware(session_pool=session_maker)
+    dp.message.middleware(db_middleware)
+    dp.callback_query.middleware(db_middleware)
+    
+    # Апдейты одного чата - по очереди, разных чатов - параллельно
+    if executor is not None:
+        OrderedUpdateMiddleware(executor).setup(dp)
+    
+    return dp
+
+
+# Фронтовый процесс режима sharded: настраивает бота и базу данных
+# один раз, принимает вебхук и раздает апдейты процессам-шардам
+async def run_front(bot: Bot, stop: ShutdownEvent) -> None:
+    async_engine = create_engine()
+    try:
+        await init_models(async_engine)
+        await update_main_menu(bot, get_session_maker(async_engine))
+    finally:
+        await async_engine.dispose()
+    
+    # Диспетчер нужен только чтобы узнать, какие апдейты запрашивать у Telegram
+    dp = Dispatcher()
+    dp.include_router(user_handlers.router)
+    dp.include_router(other_handlers.router)
+    
+    try:
+        await run_sharded(bot, dp.resolve_used_update_types(), stop)
+    finally:
+        await bot.session.close()
+
+
+# Устанавливает событие stop по SIGTERM (остановка контейнера)
+# и SIGINT (Ctrl+C) вместо немедленного завершения процесса
+def handle_stop_signals(stop: ShutdownEvent) -> None:
+    def on_signal(sig: signal.Signals) -> None:
+        logger.info('Received %s, shutting down', sig.name)
+        stop.set()
+    
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        # На Windows обработчики сигналов в цикле событий не поддерживаются
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, on_signal, sig)
+
+
+# Получает апдейты через polling, пока не будет установлено событие stop.
+# Накопившиеся апдейты пропускаются. Параллельностью управляет
+# UpdateExecutor, поэтому polling не создает задачу на каждый апдейт.
+async def run_polling(bot: Bot, dp: Dispatcher, stop: ShutdownEvent) -> None:
+    await bot.delete_webhook(drop_pending_updates=True)
+    
+    # Сигналы и закрытие сессии бота обрабатывает main()
+    polling = asyncio.create_task(dp.start_polling(
+        bot, handle_as_tasks=False, handle_signals=False, close_bot_session=False
+    ))
+    stopping = asyncio.create_task(stop.wait())
+    try:
+        await asyncio.wait((polling, stopping), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopping.cancel()
+        if not polling.done():
+            try:
+                await dp.stop_polling()
+            except RuntimeError:
+                # Polling еще не успел запуститься
+                polling.cancel()
+    with suppress(asyncio.CancelledError):
+        await polling
+
+
+# Некритичная подготовка, которая идет параллельно с приемом апдейтов
+async def warm_up(bot: Bot, session_maker: async_sessionmaker) -> None:
+    try:
+        # Команды меню отправляются в Telegram, только если изменились
+        await update_main_menu(bot, session_maker)
+    except Exception:
+        logger.exception('Failed to update bot commands')
+
+
+# Функция конфигурирования и запуска бота.
+# shard - номер процесса-шарда в режиме sharded (None для обычного запуска).
+async def main(shard: Optional[int] = None):
     # Конфигурируем логирование
     logging.basicConfig(
         level=logging.INFO,
@@ -27,35 +150,153 @@ async def main():
     )
     
     # Выводим в консоль информацию о начале запуска бота
-    logger.info('Starting bot')
+    logger.info('Starting bot' if shard is None else f'Starting shard {shard}')
     
     # Инициализируем бот и диспетчер
     bot = Bot(
         token=settings.BOT_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
-    dp = Dispatcher()
     
-    # Настраиваем главное меню бота
-    await set_main_menu(bot)
+    # Вся остановка по сигналу укладывается в SHUTDOWN_TIMEOUT
+    stop = ShutdownEvent(settings.SHUTDOWN_TIMEOUT)
+    handle_stop_signals(stop)
     
-    # Регистриуем роутеры в диспетчере
-    dp.include_router(user_handlers.router)
-    dp.include_router(other_handlers.router)
+    sharded = settings.RUN_MODE == 'sharded'
+    if sharded and shard is None:
+        await run_front(bot, stop)
+        return
+    
+    # Не отправляем редактирования, после которых сообщение не изменится.
+    # Фильтр стоит первым: пропущенные редактирования не ждут ограничителя
+    edit_filter = UnchangedEditFilter(max_messages=settings.OUTBOUND_MAX_MESSAGES)
+    bot.session.middleware(edit_filter)
+    
+    # Ограничиваем частоту запросов к Telegram и схлопываем
+    # повторные редактирования одного сообщения. Шарды делят
+    # общий лимит бота поровну: чаты у них не пересекаются,
+    # а глобальный лимит считается на каждый процесс отдельно.
+    global_rate = settings.OUTBOUND_GLOBAL_RATE
+    if sharded:
+        global_rate /= settings.SHARD_WORKERS
+    bot.session.middleware(OutboundRateLimiter(
+        global_rate=global_rate,
+        chat_rate=settings.OUTBOUND_CHAT_RATE,
+        chat_burst=settings.OUTBOUND_CHAT_BURST,
+        group_rate=settings.OUTBOUND_GROUP_RATE,
+        max_retries=settings.OUTBOUND_MAX_RETRIES,
+        max_chats=settings.OUTBOUND_MAX_CHATS,
+    ))
+    
+    # Запоминаем, что действительно отправлено (после схлопывания)
+    bot.session.middleware(edit_filter.record)
     
-    # Инициализируем базу данных
-    await init_models()
+    # Замеряем время запросов к Bot API (без ожидания в ограничителе)
+    if settings.METRICS_ENABLED:
+        bot.session.middleware(MetricsRequestMiddleware())
     
     # Настраиваем подключение к базе данных
     async_engine = create_engine()
     session_maker = get_session_maker(async_engine)
+    if settings.METRICS_ENABLED:
+        instrument_engine(async_engine)
+        instrument_caches(events=events_cache, keyboards=keyboards_cache, search=search_indexes)
     
-    # Добавляем middleware для работы с базой данных
-    dp.update.middleware(DbSessionMiddleware(session_pool=session_maker))
+    executor = UpdateExecutor(
+        workers=settings.UPDATE_WORKERS,
+        max_pending=settings.UPDATE_MAX_PENDING,
+        max_per_chat=settings.UPDATE_MAX_PENDING_PER_CHAT,
+    )
+    dp = create_dispatcher(create_storage(), session_maker, executor=executor)
+    
+    # Планировщик напоминаний доступен хэндлерам как аргумент reminders.
+    # В режиме sharded напоминания рассылает только первый шард: мероприятия
+    # остальных шардов он читает из базы раз в REMINDER_CHECK_INTERVAL.
+    reminders = None
+    if settings.REMINDERS_ENABLED and not shard:
+        reminders = ReminderScheduler(
+            bot=bot,
+            session_pool=session_maker,
+            days_before=settings.REMINDER_DAYS_BEFORE,
+            hour=settings.REMINDER_HOUR,
+            batch_size=settings.REMINDER_BATCH_SIZE,
+            rate=settings.REMINDER_RATE,
+            check_interval=settings.REMINDER_CHECK_INTERVAL,
+        )
+        dp['reminders'] = reminders
+    reminders_task = None
+    repair_task = None
+    warm_up_task = None
+    metrics_runner = None
 
-    # Пропускаем накопившиеся апдейты и запускаем polling
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    try:
+        # Инициализируем базу данных (в режиме sharded это делает фронт).
+        # Если схема актуальна, это один SELECT.
+        if not sharded:
+            await init_models(async_engine)
+            
+            # Главное меню настраиваем, уже принимая апдейты
+            warm_up_task = asyncio.create_task(warm_up(bot, session_maker))
+        
+        # Отдаем метрики на отдельном порту, у каждого шарда - свой
+        if settings.METRICS_ENABLED:
+            metrics_port = settings.METRICS_PORT if shard is None else settings.METRICS_PORT + shard + 1
+            metrics_runner = await start_metrics_server(settings.METRICS_HOST, metrics_port)
+        
+        # Запускаем отправку напоминаний в том же цикле событий
+        if reminders is not None:
+            reminders_task = asyncio.create_task(reminders.run())
+        
+        # Сверяем счетчики участников (в режиме sharded - только в первом шарде;
+        # остальные шарды увидят исправления по истечении EVENTS_CACHE_TTL)
+        if settings.COUNTER_REPAIR_INTERVAL > 0 and not shard:
+            repair_task = asyncio.create_task(CounterRepairJob(
+                session_pool=session_maker,
+                interval=settings.COUNTER_REPAIR_INTERVAL,
+                batch_size=settings.COUNTER_REPAIR_BATCH_SIZE,
+            ).run())
+        
+        if sharded:
+            # Получаем апдейты от фронтового процесса
+            await run_shard_server(bot, dp, shard, stop)
+        elif settings.RUN_MODE == 'webhook':
+            # Получаем апдейты через вебхук
+            await run_webhook(bot, dp, stop)
+        else:
+            await run_polling(bot, dp, stop)
+    finally:
+        # Прием апдейтов уже остановлен. Дорабатываем принятые апдейты
+        # и начатую пачку напоминаний (вместе с их запросами к Telegram)
+        # в то время, что осталось от SHUTDOWN_TIMEOUT после сигнала
+        # (часть его уже ушла на остановку сервера), затем закрываем
+        # сессию бота и пул БД.
+        if warm_up_task is not None:
+            warm_up_task.cancel()
+        if repair_task is not None:
+            # Каждая порция сверки - отдельная транзакция, прервать безопасно
+            repair_task.cancel()
+        if reminders is not None:
+            reminders.stop()
+        
+        # Сессия бота и пул БД закрываются, даже если предыдущие шаги упали
+        try:
+            await executor.drain(stop.remaining())
+            await executor.close()
+            
+            if reminders_task is not None:
+                try:
+                    await asyncio.wait_for(reminders_task, stop.remaining())
+                except asyncio.TimeoutError:
+                    logger.warning('Reminder scheduler did not stop in time')
+            if metrics_runner is not None:
+                await metrics_runner.cleanup()
+        finally:
+            try:
+                await bot.session.close()
+            finally:
+                # Закрываем соединения пула
+                await async_engine.dispose()
+        logger.info('Bot stopped')
 
 
 if __name__ == '__main__':
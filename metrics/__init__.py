@@ -0,0 +1,2 @@
+from .instruments import instrument_caches, instrument_engine, registry, timed
+from .server import start_metrics_server
@@ -0,0 +1,106 @@
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Iterator, Optional, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .registry import CallbackMetric, Counter, Histogram, Registry
+
+registry = Registry()
+
+UPDATE_LATENCY = registry.register(Histogram(
+    'bot_update_duration_seconds', 'Полное время обработки апдейта', ('update_type',),
+))
+HANDLER_LATENCY = registry.register(Histogram(
+    'bot_handler_duration_seconds', 'Время работы хэндлера', ('handler',),
+))
+HANDLER_ERRORS = registry.register(Counter(
+    'bot_handler_errors', 'Исключения в хэндлерах', ('handler',),
+))
+API_CALLS_PER_UPDATE = registry.register(Histogram(
+    'bot_update_api_calls', 'Запросов к Bot API на один апдейт', ('update_type',),
+    buckets=(0, 1, 2, 3, 5, 10, 20),
+))
+API_LATENCY = registry.register(Histogram(
+    'bot_api_request_duration_seconds', 'Время запроса к Bot API', ('method',),
+))
+API_ERRORS = registry.register(Counter(
+    'bot_api_request_errors', 'Неудачные запросы к Bot API', ('method',),
+))
+CRUD_LATENCY = registry.register(Histogram(
+    'bot_crud_duration_seconds', 'Время работы функций database/crud.py', ('function',),
+))
+DB_QUERY_LATENCY = registry.register(Histogram(
+    'bot_db_query_duration_seconds', 'Время выполнения SQL-запроса', ('statement',),
+))
+
+# Кэши процесса по имени: объекты с методом stats() (см. TTLCache.stats()).
+# Их статистика читается при каждом выводе метрик.
+caches: dict[str, Any] = {}
+
+
+def _cache_stat(key: str) -> Callable[[], Iterator[tuple[tuple[str, ...], float]]]:
+    return lambda: (((name,), cache.stats()[key]) for name, cache in caches.items())
+
+
+CACHE_HITS = registry.register(CallbackMetric(
+    'bot_cache_hits', 'Попадания в кэш', 'counter', _cache_stat('hits'), ('cache',),
+))
+CACHE_MISSES = registry.register(CallbackMetric(
+    'bot_cache_misses', 'Промахи кэша', 'counter', _cache_stat('misses'), ('cache',),
+))
+CACHE_SIZE = registry.register(CallbackMetric(
+    'bot_cache_size', 'Число записей в кэше', 'gauge', _cache_stat('size'), ('cache',),
+))
+
+# Число запросов к Bot API в рамках текущего апдейта.
+# Список из одного элемента, чтобы его можно было менять из вложенных задач.
+api_calls: ContextVar[Optional[list[int]]] = ContextVar('api_calls', default=None)
+
+F = TypeVar('F', bound=Callable[..., Awaitable[Any]])
+
+
+# Замеряет время работы асинхронной функции CRUD
+def timed(func: F) -> F:
+    labels = (func.__name__,)
+
+    @wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        started = perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            CRUD_LATENCY.observe(labels, perf_counter() - started)
+
+    return wrapper  # type: ignore[return-value]
+
+
+# Подключает замер времени каждого SQL-запроса через события SQLAlchemy.
+# Запросы различаются по первому слову: SELECT, INSERT, UPDATE, DELETE...
+def instrument_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(perf_counter())
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        DB_QUERY_LATENCY.observe((verb,), perf_counter() - started)
+
+    @event.listens_for(sync_engine, 'handle_error')
+    def handle_error(context):
+        # Запрос завершился ошибкой - убираем его время начала
+        if context.connection is not None:
+            stack = context.connection.info.get('query_started')
+            if stack:
+                stack.pop()
+
+
+# Добавляет кэши в метрики bot_cache_*: имя кэша - значение метки cache
+def instrument_caches(**named_caches: Any) -> None:
+    caches.update(named_caches)
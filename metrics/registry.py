@@ -0,0 +1,108 @@
+from bisect import bisect_left
+from typing import Callable, Iterable, Iterator, Sequence
+
+# Границы корзин гистограмм задержек, в секундах
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+# Счетчик в формате Prometheus.
+# Значения хранятся в словаре по кортежу меток: увеличение счетчика -
+# один поиск в словаре, без блокировок (все вызовы идут из цикла событий).
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, labels: tuple[str, ...] = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self._values.items():
+            yield f'{self.name}_total{_labels(self.labelnames, labels)} {value}'
+
+
+# Гистограмма в формате Prometheus.
+# observe() находит корзину двоичным поиском и увеличивает один счетчик;
+# накопительные значения корзин считаются только при выводе метрик.
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Метки -> [счетчики корзин (последняя - +Inf), сумма, количество]
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, labels: tuple[str, ...], value: float) -> None:
+        data = self._values.get(labels)
+        if data is None:
+            data = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        data[0][bisect_left(self.buckets, value)] += 1
+        data[1] += value
+        data[2] += 1
+
+    def samples(self) -> Iterator[str]:
+        for labels, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {total}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {count}'
+
+
+# Метрика, значения которой читаются только при выводе: read() возвращает
+# пары (метки, значение). Подходит для данных, которые уже считаются
+# в другом месте (например, статистика кэшей) - на горячем пути
+# не тратится ни одной операции.
+class CallbackMetric:
+    def __init__(self, name: str, documentation: str, type: str,
+                 read: Callable[[], Iterable[tuple[tuple[str, ...], float]]],
+                 labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.read = read
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> Iterator[str]:
+        suffix = '_total' if self.type == 'counter' else ''
+        for labels, value in self.read():
+            yield f'{self.name}{suffix}{_labels(self.labelnames, labels)} {value}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    # Текст для эндпоинта /metrics (формат Prometheus 0.0.4)
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,27 @@
+import logging
+
+from aiohttp import web
+
+from .instruments import registry
+
+logger = logging.getLogger(__name__)
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(
+        text=registry.render(),
+        content_type='text/plain',
+        headers={'X-Content-Type-Options': 'nosniff'},
+    )
+
+
+# Запускает HTTP-сервер с эндпоинтом /metrics и возвращает его runner
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    logger.info('Metrics server started on %s:%s', host, port)
+    return runner
@@ -1 +1,6 @@
-from .db import DbSessionMiddleware
\ No newline at end of file
+from .db import DbSessionMiddleware
+from .fsm import FSMBatchMiddleware
+from .outbound import OutboundRateLimiter, UnchangedEditFilter
+from .throttling import ThrottlingMiddleware
+from .metrics import MetricsMiddleware, MetricsRequestMiddleware
+from .executor import QUEUED, OrderedUpdateMiddleware, UpdateExecutor
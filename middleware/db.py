@@ -1,21 +1,63 @@
-from typing import Callable, Awaitable, Dict, Any
+from typing import Callable, Awaitable, Dict, Any, Optional
 
 from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
 from aiogram.types import TelegramObject
-from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 
+# Сессия, которая создается при первом обращении к ней.
+# Хэндлер, не дошедший до запроса к базе данных, не тратит
+# ни сессию, ни соединение из пула.
+class LazySession:
+    def __init__(self, session_pool: async_sessionmaker):
+        self._session_pool = session_pool
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._session_pool()
+        return self._session
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.session, name)
+
+    async def __aenter__(self) -> AsyncSession:
+        return await self.session.__aenter__()
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.session.__aexit__(*args)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+
+# Передает в хэндлеры сессию базы данных.
+# Регистрируется на сообщениях и callback-запросах, чтобы видеть
+# выбранный хэндлер: сессия не создается, если хэндлер не принимает
+# аргумент session или отключил ее флагом flags={'db_session': False}.
 class DbSessionMiddleware(BaseMiddleware):
     def __init__(self, session_pool: async_sessionmaker):
         super().__init__()
         self.session_pool = session_pool
-    
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
         event: TelegramObject,
         data: Dict[str, Any],
     ) -> Any:
-        async with self.session_pool() as session:
-            data["session"] = session
-            return await handler(event, data)
\ No newline at end of file
+        handler_object = data.get('handler')
+        if handler_object is not None:
+            wants_session = 'session' in handler_object.params or handler_object.varkw
+            if not wants_session or get_flag(data, 'db_session') is False:
+                return await handler(event, data)
+
+        session = LazySession(self.session_pool)
+        data["session"] = session
+        try:
+            return await handler(event, data)
+        finally:
+            await session.close()
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Awaitable, Dict, Any, Hashable, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+Job = tuple[Callable[[], Awaitable[Any]], asyncio.Future]
+
+# Результат OrderedUpdateMiddleware для апдейта, переданного исполнителю:
+# апдейт принят и будет обработан в очереди своего чата. В отличие от
+# UNHANDLED, диспетчер не пишет про такой апдейт "is not handled"
+QUEUED = object()
+
+
+# Исполнитель апдейтов: апдейты одного чата обрабатываются строго
+# по очереди, апдейты разных чатов - параллельно, не более workers
+# одновременно. Чаты с ожидающими апдейтами обслуживаются по кругу,
+# поэтому медленный запрос одного пользователя не задерживает остальных.
+# Если ожидающих апдейтов больше max_pending, submit() ждет -
+# так polling перестает забирать новые апдейты (backpressure).
+# Если у одного чата ждут уже max_per_chat апдейтов, новые апдейты
+# этого чата отбрасываются: один флудящий чат не занимает всю очередь.
+class UpdateExecutor:
+    def __init__(self, workers: int, max_pending: int, max_per_chat: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_per_chat = max_per_chat
+
+        # Очереди апдейтов по чатам. Чат есть в словаре, пока он
+        # стоит в очереди _ready или его апдейт обрабатывается.
+        self._chats: dict[Hashable, deque[Job]] = {}
+        self._ready: asyncio.Queue[Hashable] = asyncio.Queue()
+        self._slots = asyncio.Semaphore(max_pending)
+        self._tasks: list[asyncio.Task] = []
+        self._pending = 0
+        # Установлено, когда нет ни ожидающих, ни обрабатываемых апдейтов
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        # Счетчик отброшенных апдейтов
+        self.dropped = 0
+
+    # Число апдейтов в очередях и в обработке
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    # Ждет, пока будут обработаны все принятые апдейты, но не дольше
+    # timeout секунд. Возвращает False, если к сроку обработаны не все.
+    async def drain(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning('%s updates are still pending after %s s', self._pending, timeout)
+            return False
+        return True
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # Ставит задачу в очередь чата и возвращает future с ее результатом.
+    # Возвращает None, если очередь чата заполнена и задача отброшена.
+    async def submit(self, key: Hashable, job: Callable[[], Awaitable[Any]]) -> Optional[asyncio.Future]:
+        self.start()
+        await self._slots.acquire()
+        queue = self._chats.get(key)
+        if queue is not None and len(queue) >= self.max_per_chat:
+            self._slots.release()
+            self.dropped += 1
+            return None
+        self._pending += 1
+        self._idle.clear()
+
+        future = asyncio.get_running_loop().create_future()
+        if queue is None:
+            self._chats[key] = deque([(job, future)])
+            self._ready.put_nowait(key)
+        else:
+            # Чат уже в работе - задачу возьмет воркер после текущей
+            queue.append((job, future))
+        return future
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._ready.get()
+            queue = self._chats[key]
+            job, future = queue.popleft()
+            try:
+                result = await job()
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as error:
+                if not future.cancelled():
+                    future.set_exception(error)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+            finally:
+                self._pending -= 1
+                self._slots.release()
+                if not self._pending:
+                    self._idle.set()
+                if queue:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._chats[key]
+
+
+# Передает обработку апдейта в UpdateExecutor и сразу возвращает QUEUED:
+# polling или воркер вебхука могут брать следующий апдейт.
+# Ответ хэндлера (например, callback.answer()) отправляется исполнителем.
+# Если в данных апдейта передан wait_for_result=True (нажатия кнопок
+# в режиме вебхука), middleware дожидается результата и возвращает его.
+# Апдейт, отброшенный из-за переполненной очереди чата, возвращает UNHANDLED.
+class OrderedUpdateMiddleware(BaseMiddleware):
+    def __init__(self, executor: UpdateExecutor):
+        super().__init__()
+        self.executor = executor
+
+    # Регистрирует middleware сразу после UserContextMiddleware: чат уже
+    # известен, а состояние FSM читается внутри очереди чата, после того
+    # как предыдущий апдейт этого чата его изменил
+    def setup(self, dp: Dispatcher) -> None:
+        manager = dp.update.outer_middleware
+        position = next(
+            (index + 1 for index, middleware in enumerate(manager)
+             if isinstance(middleware, UserContextMiddleware)),
+            0,
+        )
+        later = list(manager[position:])
+        for middleware in later:
+            manager.unregister(middleware)
+        manager(self)
+        for middleware in later:
+            manager(middleware)
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        chat = data.get('event_chat')
+        user = data.get('event_from_user')
+        key: Hashable
+        if chat is not None:
+            key = chat.id
+        elif user is not None:
+            key = ('user', user.id)
+        else:
+            key = ('update', event.update_id)
+
+        wait_for_result = data.pop('wait_for_result', False)
+        bot: Bot = data['bot']
+
+        async def job() -> Any:
+            if wait_for_result:
+                return await handler(event, data)
+
+            try:
+                result = await handler(event, data)
+                if isinstance(result, TelegramMethod):
+                    await Dispatcher.silent_call_request(bot, result)
+                return result
+            except Exception:
+                logger.exception('Failed to process update id=%s', event.update_id)
+                return UNHANDLED
+
+        future = await self.executor.submit(key, job)
+        if future is None:
+            logger.warning('Update id=%s dropped: too many pending updates in chat %s', event.update_id, key)
+            return UNHANDLED
+        if wait_for_result:
+            return await future
+        return QUEUED
@@ -0,0 +1,29 @@
+from typing import Callable, Awaitable, Dict, Any
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject
+
+
+# Объединяет все обращения к хранилищу FSM за время обработки апдейта:
+# состояние и данные читаются одним запросом, а изменения записываются
+# одним пайплайном после завершения хэндлера.
+class FSMBatchMiddleware(BaseMiddleware):
+    def __init__(self, storage):
+        super().__init__()
+        self.storage = storage
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with self.storage.batch():
+            return await handler(event, data)
+
+    # Регистрирует middleware перед FSMContextMiddleware диспетчера,
+    # чтобы в буфер попало и чтение текущего состояния
+    def setup(self, dp: Dispatcher) -> None:
+        dp.update.outer_middleware.unregister(dp.fsm)
+        dp.update.outer_middleware(self)
+        dp.update.outer_middleware(dp.fsm)
@@ -0,0 +1,94 @@
+from time import perf_counter
+from typing import Callable, Awaitable, Dict, Any, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+
+from keyboards.callback_factory import ActionDispatcher, UserActionCall
+from metrics.instruments import (API_CALLS_PER_UPDATE, API_ERRORS, API_LATENCY, HANDLER_ERRORS,
+                                 HANDLER_LATENCY, UPDATE_LATENCY, api_calls)
+
+
+# Замеряет время обработки апдейтов и хэндлеров.
+# На уровне апдейта считает полное время и число запросов к Bot API,
+# на уровне сообщений и callback-запросов - время выбранного хэндлера.
+# Для нажатий кнопок хэндлер определяется по действию в таблице actions.
+class MetricsMiddleware(BaseMiddleware):
+    def __init__(self, actions: Optional[ActionDispatcher] = None):
+        super().__init__()
+        self.actions = actions
+
+    def setup(self, dp: Dispatcher) -> None:
+        dp.update.outer_middleware(self._update)
+        dp.message.middleware(self)
+        dp.callback_query.middleware(self)
+
+    async def _update(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        labels = (event.event_type,)
+        calls = [0]
+        token = api_calls.set(calls)
+        started = perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            UPDATE_LATENCY.observe(labels, perf_counter() - started)
+            API_CALLS_PER_UPDATE.observe(labels, calls[0])
+            api_calls.reset(token)
+
+    def _handler_name(self, data: Dict[str, Any]) -> str:
+        callback_data = data.get('callback_data')
+        if self.actions is not None and isinstance(callback_data, UserActionCall):
+            name = self.actions.handler_name(callback_data.action)
+            if name is not None:
+                return name
+        handler_object = data.get('handler')
+        return handler_object.callback.__name__ if handler_object is not None else 'unknown'
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        labels = (self._handler_name(data),)
+        started = perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(labels)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(labels, perf_counter() - started)
+
+
+# Замеряет время запросов к Bot API по методам и считает их
+# для текущего апдейта. Регистрируется на сессии бота последним,
+# чтобы в замер не попадало ожидание в ограничителе частоты.
+class MetricsRequestMiddleware(BaseRequestMiddleware):
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        labels = (method.__api_method__,)
+        calls = api_calls.get()
+        if calls is not None:
+            calls[0] += 1
+
+        started = perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            API_ERRORS.inc(labels)
+            raise
+        finally:
+            API_LATENCY.observe(labels, perf_counter() - started)
@@ -0,0 +1,292 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Hashable, Optional
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import EditMessageReplyMarkup, EditMessageText, Response, SendMessage, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import Message
+
+logger = logging.getLogger(__name__)
+
+# Редактирования, которые можно схлопнуть: следующий вызов того же
+# метода для того же сообщения полностью заменяет предыдущий
+COALESCED_METHODS = (EditMessageText, EditMessageReplyMarkup)
+
+# Текст или клавиатура сообщения, которые фильтр редактирований не знает
+# (например, текст незнакомого сообщения после изменения одной клавиатуры)
+_UNKNOWN = object()
+
+
+# Ведро токенов: пропускает не больше rate запросов в секунду
+# с возможным всплеском до capacity запросов.
+# Ожидающие получают токены в порядке очереди.
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    # Останавливает выдачу токенов, например после ответа 429
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, monotonic() + seconds)
+        self._tokens = 0
+        # За время паузы токены не копятся, иначе после нее ушел бы всплеск
+        self._updated_at = self._paused_until
+
+
+# Отложенное редактирование сообщения: пока оно ждет своей очереди,
+# более новое редактирование того же сообщения заменяет метод,
+# а все вызвавшие получают результат последнего отправленного.
+class _PendingEdit:
+    def __init__(self, method: TelegramMethod[Any]):
+        self.method = method
+        self.result: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    # Передает ошибку отправки всем, кто ждет этого редактирования
+    def fail(self, error: BaseException) -> None:
+        if isinstance(error, asyncio.CancelledError):
+            self.result.cancel()
+        else:
+            self.result.set_exception(error)
+            # Исключение уже выброшено отправителю - не пишем в лог
+            # "Future exception was never retrieved", если ожидающих нет
+            self.result.exception()
+
+
+# Планировщик исходящих запросов к Telegram Bot API.
+# Ограничивает частоту запросов общим ведром токенов и ведром на каждый чат,
+# при ответе 429 выжидает retry_after и повторяет запрос, а подряд идущие
+# редактирования одного сообщения схлопывает до последнего.
+# Запросы без chat_id (getUpdates, answerCallbackQuery и т.п.) не ограничиваются.
+class OutboundRateLimiter(BaseRequestMiddleware):
+    def __init__(
+        self,
+        global_rate: float,
+        chat_rate: float,
+        chat_burst: float,
+        group_rate: float,
+        max_retries: int,
+        max_chats: int,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self._chat_buckets: OrderedDict[Hashable, TokenBucket] = OrderedDict()
+        self._pending_edits: dict[tuple[Any, ...], _PendingEdit] = {}
+
+        # Счетчики для диагностики
+        self.retries = 0
+        self.coalesced = 0
+
+    # Ведро токенов чата. Ведра давно не писавших чатов вытесняются
+    def _chat_bucket(self, chat_id: Hashable) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Группы и каналы (отрицательный ID или @username) ограничены строже
+            is_private = isinstance(chat_id, int) and chat_id > 0
+            bucket = TokenBucket(
+                self.chat_rate if is_private else self.group_rate,
+                self.chat_burst if is_private else 1,
+            )
+            self._chat_buckets[chat_id] = bucket
+            while len(self._chat_buckets) > self.max_chats:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        if not isinstance(method, COALESCED_METHODS) or method.message_id is None:
+            return await self._send(make_request, bot, method, chat_id)
+
+        key = (chat_id, method.message_id)
+        pending = self._pending_edits.get(key)
+        if pending is not None and type(pending.method) is type(method):
+            # Редактирование еще не отправлено - подменяем его новым
+            pending.method = method
+            self.coalesced += 1
+            return await asyncio.shield(pending.result)
+
+        # Редактирование другого вида нельзя схлопывать с предыдущим:
+        # оно займет место в очереди, а предыдущее уйдет как есть
+        pending = self._pending_edits[key] = _PendingEdit(method)
+        try:
+            await self._wait_turn(chat_id)
+        except BaseException as error:
+            pending.fail(error)
+            raise
+        finally:
+            # С этого момента новые редактирования встают в очередь отдельно
+            if self._pending_edits.get(key) is pending:
+                del self._pending_edits[key]
+
+        try:
+            response = await self._send(make_request, bot, pending.method, chat_id, waited=True)
+        except BaseException as error:
+            pending.fail(error)
+            raise
+        pending.result.set_result(response)
+        return response
+
+    async def _wait_turn(self, chat_id: Hashable) -> None:
+        await self._chat_bucket(chat_id).acquire()
+        await self.global_bucket.acquire()
+
+    async def _send(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        chat_id: Hashable,
+        waited: bool = False,
+    ) -> Response[TelegramType]:
+        attempt = 0
+        while True:
+            if not waited:
+                await self._wait_turn(chat_id)
+            waited = False
+
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as error:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.retries += 1
+
+                # 429 - сигнал флуд-контроля всего бота: пока не истечет
+                # retry_after, не отправляем ничего ни в этот чат, ни в другие,
+                # иначе они упрутся в тот же лимит и получат новые 429
+                logger.warning(
+                    'Flood control for chat %s, retry in %s s (attempt %s)',
+                    chat_id, error.retry_after, attempt,
+                )
+                self._chat_bucket(chat_id).pause(error.retry_after)
+                self.global_bucket.pause(error.retry_after)
+
+
+# Пропускает редактирования, которые не меняют сообщение.
+# Для сообщений, отправленных и отредактированных ботом, запоминает
+# текст и клавиатуру (в JSON, как они уходят в Telegram) и последний
+# полученный от Telegram объект Message. Если новое редактирование совпадает
+# с тем, что уже показано, запрос не отправляется, а вызвавший получает
+# этот Message - как если бы Telegram принял редактирование.
+# На ошибку Telegram "message is not modified" тоже возвращается
+# запомненный Message; если сообщение не запомнено, ошибка пробрасывается.
+# Редактирования inline-сообщений (без chat_id) не фильтруются.
+#
+# Регистрируется на сессии бота в две части вокруг OutboundRateLimiter:
+# сам фильтр - до ограничителя (первым), чтобы пропущенные редактирования
+# не ждали и не тратили токены, а record - после него, чтобы запоминалось
+# то, что действительно отправлено (с учетом схлопывания).
+class UnchangedEditFilter(BaseRequestMiddleware):
+    def __init__(self, max_messages: int):
+        self.max_messages = max_messages
+        self._shown: OrderedDict[tuple[Any, int], tuple[Any, Optional[str], Message]] = OrderedDict()
+        # Редактирования, которые сейчас ждут в ограничителе или отправляются.
+        # Пока они есть, показанное сообщение еще может измениться,
+        # и совпадение с ним ничего не значит
+        self._in_flight: dict[tuple[Any, int], int] = {}
+
+        # Счетчик пропущенных редактирований
+        self.skipped = 0
+
+    def _remember(self, key: tuple[Any, int], text: Any, markup: Optional[str], message: Message) -> None:
+        self._shown[key] = (text, markup, message)
+        self._shown.move_to_end(key)
+        while len(self._shown) > self.max_messages:
+            self._shown.popitem(last=False)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if not isinstance(method, COALESCED_METHODS) or method.chat_id is None or method.message_id is None:
+            return await make_request(bot, method)
+
+        key = (method.chat_id, method.message_id)
+        shown_text, shown_markup, shown_message = self._shown.get(key, (_UNKNOWN, _UNKNOWN, None))
+        # Изменение одной клавиатуры не трогает текст
+        text = method.text if isinstance(method, EditMessageText) else shown_text
+
+        if not self._in_flight.get(key) and _markup_json(method.reply_markup) == shown_markup and text == shown_text:
+            self.skipped += 1
+            self._shown.move_to_end(key)
+            return shown_message
+
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        try:
+            return await make_request(bot, method)
+        except TelegramBadRequest as error:
+            shown_message = self._shown.get(key, (None, None, None))[2]
+            if 'message is not modified' not in error.message or shown_message is None:
+                raise
+            self.skipped += 1
+            return shown_message
+        finally:
+            self._in_flight[key] -= 1
+            if not self._in_flight[key]:
+                del self._in_flight[key]
+
+    # Запоминает отправленные сообщения и примененные редактирования
+    async def record(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        result = await make_request(bot, method)
+        if not isinstance(result, Message):
+            return result
+
+        if isinstance(method, SendMessage):
+            self._remember((method.chat_id, result.message_id), method.text, _markup_json(method.reply_markup), result)
+        elif isinstance(method, COALESCED_METHODS) and method.chat_id is not None and method.message_id is not None:
+            key = (method.chat_id, method.message_id)
+            text = method.text if isinstance(method, EditMessageText) else self._shown.get(key, (_UNKNOWN,))[0]
+            self._remember(key, text, _markup_json(method.reply_markup), result)
+        return result
+
+
+def _markup_json(markup: Any) -> Optional[str]:
+    return markup.model_dump_json(exclude_none=True) if markup is not None else None
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+from math import inf
+from time import monotonic
+from typing import Callable, Awaitable, Dict, Any, Hashable
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery
+
+
+# Отбрасывает повторные нажатия одной и той же кнопки одним пользователем.
+# Пока нажатие обрабатывается и еще window секунд после этого такие же
+# нажатия (с теми же callback-данными) не доходят до хэндлера и базы данных:
+# на них только отвечается callback.answer(), чтобы кнопка не "висела".
+# Регистрируется как outer middleware на callback-запросах.
+class ThrottlingMiddleware(BaseMiddleware):
+    def __init__(self, window: float, max_keys: int):
+        super().__init__()
+        self.window = window
+        self.max_keys = max_keys
+
+        # (ID пользователя, callback-данные) -> момент, до которого
+        # повторные нажатия отбрасываются. Работает в одном потоке
+        # цикла событий, поэтому блокировки не нужны.
+        self._blocked_until: OrderedDict[Hashable, float] = OrderedDict()
+
+        # Счетчики для диагностики
+        self.passed = 0
+        self.dropped = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: Dict[str, Any],
+    ) -> Any:
+        key = (event.from_user.id, event.data)
+        now = monotonic()
+
+        if self._blocked_until.get(key, 0) > now:
+            self.dropped += 1
+            return event.answer()
+
+        # Пока хэндлер работает, повторы отбрасываются без ограничения по времени
+        self._blocked_until[key] = inf
+        self._blocked_until.move_to_end(key)
+        while len(self._blocked_until) > self.max_keys:
+            self._blocked_until.popitem(last=False)
+
+        self.passed += 1
+        try:
+            return await handler(event, data)
+        finally:
+            if key in self._blocked_until:
+                self._blocked_until[key] = monotonic() + self.window
@@ -0,0 +1,5 @@
+from .counters import CounterRepairJob
+from .participants_export import EXPORT_FORMATS, ParticipantsExportError, export_participants
+from .participants_import import ParticipantsFileError, parse_participant_names, parse_participants_file
+from .reminders import ReminderScheduler
+from .shutdown import ShutdownEvent
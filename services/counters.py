@@ -0,0 +1,46 @@
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from database.crud import repair_participant_counts
+
+logger = logging.getLogger(__name__)
+
+
+# Периодически сверяет счетчики участников (events.participant_count)
+# с таблицей participants и исправляет расхождения - например, после
+# ручных правок в базе. Мероприятия проверяются порциями по batch_size,
+# каждая порция - в своей короткой транзакции.
+#
+# Кэш списков мероприятий сбрасывается только в процессе, где идет
+# сверка. В режиме sharded остальные шарды показывают исправленный
+# счетчик не позже чем через EVENTS_CACHE_TTL: расхождение и так
+# возникает лишь после ручных правок в базе, и задержка в пределах
+# TTL дешевле, чем общая версия кэша, которую шарды читали бы из базы
+# на каждый список.
+class CounterRepairJob:
+    def __init__(self, session_pool: async_sessionmaker, interval: float, batch_size: int):
+        self.session_pool = session_pool
+        self.interval = interval
+        self.batch_size = batch_size
+
+    # Проверяет все мероприятия и возвращает число исправленных
+    async def repair(self) -> int:
+        fixed, after = 0, 0
+        while after is not None:
+            batch_fixed, after = await repair_participant_counts(self.session_pool(), after, self.batch_size)
+            fixed += batch_fixed
+        return fixed
+
+    # Основной цикл, запускается задачей в main()
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                fixed = await self.repair()
+            except Exception:
+                logger.exception('Participant counters repair failed')
+                continue
+            if fixed:
+                logger.warning('Participant counters repaired for %s events', fixed)
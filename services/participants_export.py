@@ -0,0 +1,109 @@
+import asyncio
+import csv
+import os
+import tempfile
+from datetime import date
+from typing import Any, AsyncIterable, AsyncIterator
+
+from config_data.config import settings
+
+# Форматы выгрузки списков участников
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+EXPORT_HEADER = ('Мероприятие', 'Дата', 'Участник')
+
+
+class ParticipantsExportError(RuntimeError):
+    pass
+
+
+# Значения, с которых Excel и LibreOffice начинают формулу. Имя гостя
+# вида "=HYPERLINK(...)" не должно выполниться при открытии файла
+# (formula injection): в CSV такие ячейки экранируются апострофом,
+# а в XLSX записываются ячейками явного строкового типа.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _safe_cell(value: str) -> str:
+    return "'" + value if value.startswith(FORMULA_PREFIXES) else value
+
+
+def _xlsx_cell(sheet: Any, value: str) -> Any:
+    if not value.startswith(FORMULA_PREFIXES):
+        return value
+    from openpyxl.cell import WriteOnlyCell
+
+    # openpyxl сам считает формулой строку, начинающуюся с "="
+    cell = WriteOnlyCell(sheet, value)
+    cell.data_type = 's'
+    return cell
+
+
+# Читает строки порциями по batch_size
+async def _batches(rows: AsyncIterable[tuple[str, date, str]],
+                   batch_size: int) -> AsyncIterator[list[tuple[str, date, str]]]:
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write_csv_rows(writer: Any, batch: list[tuple[str, date, str]]) -> None:
+    writer.writerows(
+        (_safe_cell(title), event_date.strftime('%d/%m/%Y'), _safe_cell(username))
+        for title, event_date, username in batch
+    )
+
+
+def _write_xlsx_rows(sheet: Any, batch: list[tuple[str, date, str]]) -> None:
+    for title, event_date, username in batch:
+        sheet.append((_xlsx_cell(sheet, title), event_date, _xlsx_cell(sheet, username)))
+
+
+# Записывает строки (название, дата, участник) во временный файл CSV или XLSX
+# по мере их получения и возвращает путь к файлу и число строк.
+# Строки читаются из базы порциями, и каждая порция записывается в файл
+# в отдельном потоке (как и сохранение книги XLSX), чтобы запись не
+# останавливала цикл событий. В памяти держится только текущая порция;
+# файл удаляет вызывающий.
+async def export_participants(rows: AsyncIterable[tuple[str, date, str]],
+                              file_format: str = 'csv',
+                              batch_size: int = settings.EXPORT_BATCH_SIZE) -> tuple[str, int]:
+    if file_format == 'xlsx':
+        try:
+            from openpyxl import Workbook
+        except ImportError as e:
+            raise ParticipantsExportError('Для выгрузки в XLSX нужен пакет openpyxl') from e
+    elif file_format != 'csv':
+        raise ParticipantsExportError(f'Неизвестный формат выгрузки: {file_format}')
+
+    fd, path = tempfile.mkstemp(suffix=f'.{file_format}', prefix='participants_')
+    count = 0
+    try:
+        if file_format == 'csv':
+            # utf-8-sig - чтобы Excel правильно открыл кириллицу
+            with os.fdopen(fd, 'w', encoding='utf-8-sig', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(EXPORT_HEADER)
+                async for batch in _batches(rows, batch_size):
+                    await asyncio.to_thread(_write_csv_rows, writer, batch)
+                    count += len(batch)
+        else:
+            os.close(fd)
+            # Потоковая книга: строки сразу уходят во временный файл openpyxl
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet('Участники')
+            sheet.append(EXPORT_HEADER)
+            async for batch in _batches(rows, batch_size):
+                await asyncio.to_thread(_write_xlsx_rows, sheet, batch)
+                count += len(batch)
+            await asyncio.to_thread(workbook.save, path)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return path, count
@@ -0,0 +1,30 @@
+import csv
+import io
+import re
+
+# Разделители имен в тексте: перевод строки, запятая или точка с запятой
+NAMES_SEPARATOR = re.compile(r'[\n,;]+')
+
+
+class ParticipantsFileError(ValueError):
+    pass
+
+
+# Разбирает список имен из текста сообщения
+def parse_participant_names(text: str) -> list[str]:
+    return [name.strip() for name in NAMES_SEPARATOR.split(text) if name.strip()]
+
+
+# Разбирает список имен из файла CSV (первая колонка) или TXT
+def parse_participants_file(content: bytes, filename: str) -> list[str]:
+    try:
+        text = content.decode('utf-8-sig')
+    except UnicodeDecodeError as e:
+        raise ParticipantsFileError('Файл должен быть в кодировке UTF-8') from e
+
+    if filename.lower().endswith('.csv'):
+        return [
+            row[0].strip() for row in csv.reader(io.StringIO(text))
+            if row and row[0].strip()
+        ]
+    return parse_participant_names(text)
@@ -0,0 +1,206 @@
+import asyncio
+import heapq
+import logging
+from datetime import date, datetime, time, timedelta
+from html import escape
+from time import monotonic
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from database.crud import (claim_event_reminders, get_events_for_reminders, get_max_event_id,
+                           get_new_events_for_reminders)
+from database.records import ReminderRecord
+from lexicon.lexicon import LEXICON
+from middleware.outbound import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+# Планировщик напоминаний создателям о предстоящих мероприятиях.
+# Напоминание отправляется за days_before дней до даты мероприятия в hour часов.
+#
+# В памяти хранится куча напоминаний только на ближайшие дни. Раз в день
+# (при смене даты) она строится заново запросом неотправленных напоминаний
+# (events.reminded) по диапазону дат через индекс ix_events_date_id.
+# В течение дня раз в check_interval догружаются только мероприятия,
+# созданные после прошлой проверки (по id), - так планировщик видит
+# мероприятия других процессов (шардов), не перечитывая весь диапазон.
+#
+# Напоминания отправляются пачками по batch_size не чаще rate сообщений
+# в секунду - это ниже общего лимита бота, и у ответов пользователям
+# остается запас даже при тысячах мероприятий на одну дату.
+class ReminderScheduler:
+    def __init__(
+        self,
+        bot: Bot,
+        session_pool: async_sessionmaker,
+        days_before: int,
+        hour: int,
+        batch_size: int,
+        rate: float,
+        check_interval: float,
+    ):
+        self.bot = bot
+        self.session_pool = session_pool
+        self.days_before = days_before
+        self.hour = hour
+        self.batch_size = batch_size
+        self.check_interval = check_interval
+        self._bucket = TokenBucket(rate, 1)
+
+        # (время отправки, ID мероприятия, запись)
+        self._heap: list[tuple[datetime, int, ReminderRecord]] = []
+        self._queued: set[int] = set()
+
+        # Дата, на которую куча построена, и время (по monotonic) последней догрузки
+        self._loaded_on: Optional[date] = None
+        self._loaded_at = 0.0
+        # Мероприятия с id больше _scan_from проверяются при следующей
+        # догрузке; _max_id - наибольший id на момент прошлой проверки
+        self._scan_from = 0
+        self._max_id = 0
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+        # Счетчик для диагностики
+        self.sent = 0
+
+    def _due_at(self, event_date: date) -> datetime:
+        return datetime.combine(event_date - timedelta(days=self.days_before), time(self.hour))
+
+    def _push(self, record: ReminderRecord) -> None:
+        if record.id in self._queued:
+            return
+        self._queued.add(record.id)
+        heapq.heappush(self._heap, (self._due_at(record.date), record.id, record))
+
+    def _date_to(self) -> date:
+        return date.today() + timedelta(days=self.days_before + 1)
+
+    # Ускоряет напоминание о мероприятии, созданном в этом процессе:
+    # не ждем следующей загрузки из базы. Мероприятия других процессов
+    # (шардов) попадут в кучу при очередной загрузке
+    def add_event(self, record: ReminderRecord) -> None:
+        if not date.today() <= record.date <= self._date_to():
+            return
+        self._push(record)
+        self._wakeup.set()
+
+    # Строит кучу из мероприятий, напоминания о которых нужно отправить
+    # сегодня или завтра: целиком при смене даты, а в течение дня не чаще
+    # check_interval догружает новые мероприятия
+    async def _load(self) -> None:
+        today = date.today()
+        if self._loaded_on != today:
+            await self._load_window(today)
+        elif monotonic() - self._loaded_at >= self.check_interval:
+            await self._load_new(today)
+
+    async def _load_window(self, today: date) -> None:
+        # id читается до диапазона: созданное во время чтения догрузится позже
+        max_id = await get_max_event_id(self.session_pool())
+        date_to = self._date_to()
+        self._heap = []
+        self._queued = set()
+        after = None
+        while True:
+            records = await get_events_for_reminders(
+                self.session_pool(), today, date_to, after, self.batch_size
+            )
+            for record in records:
+                self._push(record)
+            if len(records) < self.batch_size:
+                break
+            after = (records[-1].date, records[-1].id)
+
+        self._loaded_on = today
+        self._loaded_at = monotonic()
+        self._scan_from = self._max_id = max_id
+        logger.info('Reminders loaded until %s, %s queued', date_to, len(self._heap))
+
+    async def _load_new(self, today: date) -> None:
+        max_id = await get_max_event_id(self.session_pool())
+        after_id = self._scan_from
+        while True:
+            records = await get_new_events_for_reminders(
+                self.session_pool(), today, self._date_to(), after_id, self.batch_size
+            )
+            for record in records:
+                self._push(record)
+            if len(records) < self.batch_size:
+                break
+            after_id = records[-1].id
+
+        # Следующая проверка начинается с id прошлой, а не этой: мероприятие
+        # с меньшим id может закоммититься позже (повторы отсекает _queued)
+        self._scan_from, self._max_id = self._max_id, max_id
+        self._loaded_at = monotonic()
+
+    async def _send(self, record: ReminderRecord) -> None:
+        try:
+            await self.bot.send_message(
+                chat_id=record.creator_id,
+                text=LEXICON['event_reminder'].format(
+                    title=escape(record.title),
+                    date=record.date.strftime('%d/%m/%Y'),
+                ),
+            )
+            self.sent += 1
+        except TelegramAPIError as error:
+            # Например, пользователь заблокировал бота - повторять бессмысленно
+            logger.warning('Reminder for event %s not sent: %s', record.id, error)
+
+    # Отправляет все наступившие напоминания пачками
+    async def _send_due(self) -> None:
+        while self._heap and self._heap[0][0] <= datetime.now():
+            batch = []
+            if self._stopping:
+                return
+            while self._heap and self._heap[0][0] <= datetime.now() and len(batch) < self.batch_size:
+                _, event_id, record = heapq.heappop(self._heap)
+                self._queued.discard(event_id)
+                batch.append(record)
+
+            # Сначала забираем пачку в базе, затем отправляем: напоминание
+            # не уйдет дважды и не уйдет о мероприятии, удаленном после загрузки
+            claimed = await claim_event_reminders(self.session_pool(), [record.id for record in batch])
+            tasks = []
+            for record in batch:
+                if record.id not in claimed:
+                    continue
+                await self._bucket.acquire()
+                tasks.append(asyncio.create_task(self._send(record)))
+            await asyncio.gather(*tasks)
+
+    # Просит планировщик остановиться: начатая (уже забранная) пачка
+    # напоминаний дорабатывается, новые не начинаются
+    def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+
+    # Основной цикл планировщика, запускается задачей в main()
+    async def run(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                await self._load()
+                await self._send_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Reminder scheduler iteration failed')
+
+            # Спим до ближайшего напоминания, но не дольше check_interval,
+            # чтобы вовремя догрузить новые мероприятия и сменить дату
+            timeout = self.check_interval
+            if self._heap:
+                until_next = (self._heap[0][0] - datetime.now()).total_seconds()
+                timeout = max(0.0, min(timeout, until_next))
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
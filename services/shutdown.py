@@ -0,0 +1,26 @@
+import asyncio
+from typing import Optional
+
+
+# Событие остановки процесса с общим сроком на ее завершение.
+# Срок отсчитывается от момента установки события (сигнала остановки),
+# и каждый шаг остановки получает только оставшееся время, поэтому
+# вся остановка укладывается в timeout секунд.
+class ShutdownEvent(asyncio.Event):
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+        self._deadline: Optional[float] = None
+
+    def set(self) -> None:
+        if self._deadline is None:
+            self._deadline = asyncio.get_running_loop().time() + self.timeout
+        super().set()
+
+    # Сколько секунд осталось до срока. Если процесс останавливается
+    # без сигнала (например, из-за ошибки), срок отсчитывается с первого вызова
+    def remaining(self) -> float:
+        loop = asyncio.get_running_loop()
+        if self._deadline is None:
+            self._deadline = loop.time() + self.timeout
+        return max(0.0, self._deadline - loop.time())
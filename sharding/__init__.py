@@ -0,0 +1,2 @@
+from .front import ShardingFront, run_sharded, shard_for_update
+from .supervisor import WorkerSupervisor
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import logging
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiohttp import ClientError, ClientSession, ClientTimeout, web
+
+from config_data.config import settings
+from services.shutdown import ShutdownEvent
+from webhook import set_webhook, stop_app
+from .supervisor import STOP_GRACE, WorkerSupervisor
+
+logger = logging.getLogger(__name__)
+
+
+# Выбирает шард для апдейта по ID пользователя, от которого он пришел.
+# Все апдейты пользователя попадают в один процесс, поэтому его
+# состояние FSM и закэшированные списки остаются в памяти этого процесса.
+# Апдейты без пользователя распределяются по чату или по номеру апдейта.
+def shard_for_update(update: dict[str, Any], shards: int) -> int:
+    for key, value in update.items():
+        if key == 'update_id' or not isinstance(value, dict):
+            continue
+        user = value.get('from') or value.get('user')
+        if user:
+            return user['id'] % shards
+        chat = value.get('chat')
+        if chat:
+            return chat['id'] % shards
+    return update.get('update_id', 0) % shards
+
+
+# Фронтовый процесс: принимает вебхук Telegram и пересылает апдейт
+# как есть процессу-шарду, а его ответ (например, ответ на callback)
+# возвращает Telegram. Если шард недоступен (перезапускается),
+# Telegram получает 503 и повторит доставку.
+class ShardingFront:
+    def __init__(self, shards: int, secret_token: Optional[str] = None):
+        self.shards = shards
+        self.secret_token = secret_token
+        self._session: Optional[ClientSession] = None
+
+    def _shard_url(self, shard: int) -> str:
+        return f'http://{settings.SHARD_HOST}:{settings.SHARD_BASE_PORT + shard}{settings.SHARD_PATH}'
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret_token and request.headers.get('X-Telegram-Bot-Api-Secret-Token') != self.secret_token:
+            return web.Response(status=401)
+
+        body = await request.read()
+        try:
+            shard = shard_for_update(json.loads(body), self.shards)
+        except (ValueError, TypeError, KeyError):
+            return web.Response(status=400)
+
+        try:
+            async with self._session.post(
+                self._shard_url(shard), data=body, headers={'Content-Type': 'application/json'}
+            ) as response:
+                # Content-Type передаем как есть: в ответе с методом Bot API
+                # это multipart/form-data с boundary, без него тело не разобрать
+                headers = {}
+                if 'Content-Type' in response.headers:
+                    headers['Content-Type'] = response.headers['Content-Type']
+                return web.Response(status=response.status, body=await response.read(), headers=headers)
+        except (ClientError, asyncio.TimeoutError):
+            logger.warning('Shard %s is unavailable', shard)
+            return web.Response(status=503)
+
+    async def start(self) -> web.AppRunner:
+        # Telegram ждет ответ на вебхук не дольше минуты
+        self._session = ClientSession(timeout=ClientTimeout(total=55))
+
+        app = web.Application()
+        app.router.add_post(settings.WEBHOOK_PATH, self.handle)
+        runner = web.AppRunner(app, access_log=None, shutdown_timeout=settings.SHUTDOWN_TIMEOUT)
+        await runner.setup()
+        await web.TCPSite(runner, host=settings.WEBAPP_HOST, port=settings.WEBAPP_PORT).start()
+        return runner
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+
+# Запускает процессы-шарды под надзором супервизора и фронтовый сервер.
+# По событию stop сразу отправляет шардам SIGTERM и одновременно прекращает
+# прием апдейтов, дожидаясь ответов шардов на уже принятые. Шарды
+# дорабатывают свои апдейты (см. main()) в тот же срок SHUTDOWN_TIMEOUT,
+# отсчитанный от сигнала; не завершившиеся через STOP_GRACE после срока
+# завершаются принудительно.
+async def run_sharded(bot: Bot, allowed_updates: list[str], stop: ShutdownEvent) -> None:
+    from .worker import run_worker
+
+    supervisor = WorkerSupervisor(settings.SHARD_WORKERS, run_worker, settings.SHARD_RESTART_DELAY)
+    front = ShardingFront(settings.SHARD_WORKERS, settings.WEBHOOK_SECRET)
+
+    supervisor.start()
+    watch_task = asyncio.create_task(supervisor.watch())
+    runner = await front.start()
+    try:
+        await set_webhook(bot, allowed_updates)
+        logger.info(
+            'Sharding front started on %s:%s with %s shards',
+            settings.WEBAPP_HOST, settings.WEBAPP_PORT, settings.SHARD_WORKERS,
+        )
+        await stop.wait()
+    finally:
+        watch_task.cancel()
+        stopping = asyncio.create_task(supervisor.stop(timeout=stop.remaining() + STOP_GRACE))
+        try:
+            await stop_app(runner, stop)
+            await front.close()
+        finally:
+            await stopping
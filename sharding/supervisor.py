@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import multiprocessing
+from time import monotonic
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Процесс, проработавший дольше этого времени, считается стабильным,
+# и задержка перед следующим перезапуском сбрасывается
+STABLE_UPTIME = 60.0
+MAX_RESTART_DELAY = 30.0
+
+# Сколько секунд после срока остановки шарду дается на закрытие
+# сессии бота и пула БД, прежде чем он будет завершен принудительно
+STOP_GRACE = 5.0
+
+
+# Запускает count процессов target(index) и перезапускает упавшие.
+# Если процесс падает сразу после старта, задержка перед перезапуском
+# удваивается (до MAX_RESTART_DELAY), чтобы не крутиться в цикле.
+class WorkerSupervisor:
+    def __init__(self, count: int, target: Callable[[int], None], restart_delay: float):
+        self.count = count
+        self.target = target
+        self.restart_delay = restart_delay
+        self._context = multiprocessing.get_context('spawn')
+        self._processes: list[Optional[multiprocessing.process.BaseProcess]] = [None] * count
+        self._started_at = [0.0] * count
+        self._delays = [restart_delay] * count
+        self._stopping = False
+
+    def _spawn(self, index: int) -> None:
+        process = self._context.Process(target=self.target, args=(index,), name=f'shard-{index}')
+        process.start()
+        self._processes[index] = process
+        self._started_at[index] = monotonic()
+        logger.info('Shard %s started, pid %s', index, process.pid)
+
+    def start(self) -> None:
+        for index in range(self.count):
+            self._spawn(index)
+
+    async def _restart(self, index: int, exitcode: Optional[int]) -> None:
+        uptime = monotonic() - self._started_at[index]
+        if uptime > STABLE_UPTIME:
+            self._delays[index] = self.restart_delay
+        delay = self._delays[index]
+        self._delays[index] = min(delay * 2, MAX_RESTART_DELAY)
+
+        logger.error('Shard %s exited with code %s, restart in %.1f s', index, exitcode, delay)
+        await asyncio.sleep(delay)
+        if not self._stopping:
+            self._spawn(index)
+
+    # Следит за процессами, пока супервизор не остановят
+    async def watch(self, interval: float = 1.0) -> None:
+        restarting: dict[int, asyncio.Task] = {}
+        while not self._stopping:
+            for index, process in enumerate(self._processes):
+                if index in restarting or process is None or process.is_alive():
+                    continue
+                task = asyncio.create_task(self._restart(index, process.exitcode))
+                task.add_done_callback(lambda _, index=index: restarting.pop(index, None))
+                restarting[index] = task
+            await asyncio.sleep(interval)
+
+    # Останавливает процессы: SIGTERM, затем ждет не дольше timeout
+    # секунд на все процессы вместе (шарды в это время дорабатывают
+    # принятые апдейты), а оставшиеся завершает принудительно
+    async def stop(self, timeout: float = 10.0) -> None:
+        self._stopping = True
+        processes = [process for process in self._processes if process is not None]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+        deadline = monotonic() + timeout
+        for process in processes:
+            await asyncio.to_thread(process.join, max(0.0, deadline - monotonic()))
+            if process.is_alive():
+                logger.warning('Shard %s did not stop in time, killing it', process.name)
+                process.kill()
@@ -0,0 +1,11 @@
+import asyncio
+
+
+# Точка входа процесса-шарда (запускается супервизором через spawn)
+def run_worker(shard: int) -> None:
+    from main import main
+
+    try:
+        asyncio.run(main(shard=shard))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1 @@
+from .server import QueuedRequestHandler, run_shard_server, run_webhook, set_webhook, stop_app
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config_data.config import settings
+from services.shutdown import ShutdownEvent
+
+logger = logging.getLogger(__name__)
+
+
+# Обработчик вебхука с ограниченной очередью апдейтов и пулом воркеров.
+# Нажатия инлайн-кнопок обрабатываются сразу, чтобы ответ на callback
+# ушел в теле ответа на вебхук, а не отдельным запросом к Bot API.
+# Остальные апдейты кладутся в очередь; если она заполнена, Telegram
+# получает 503 и повторит доставку позже.
+class QueuedRequestHandler(SimpleRequestHandler):
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        workers: int,
+        queue_size: int,
+        stop: ShutdownEvent,
+        secret_token: Optional[str] = None,
+        **data: Any,
+    ):
+        super().__init__(
+            dispatcher=dispatcher,
+            bot=bot,
+            handle_in_background=True,
+            secret_token=secret_token,
+            **data,
+        )
+        self.workers = workers
+        self.stop = stop
+        self.queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(maxsize=queue_size)
+        self._slots = asyncio.Semaphore(workers)
+        self._worker_tasks: list[asyncio.Task] = []
+
+    def register(self, app: web.Application, /, path: str, **kwargs: Any) -> None:
+        super().register(app, path, **kwargs)
+        app.on_startup.append(self._start_workers)
+
+    async def _start_workers(self, app: web.Application) -> None:
+        self._worker_tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def _worker(self) -> None:
+        while True:
+            update = await self.queue.get()
+            try:
+                async with self._slots:
+                    await self._background_feed_update(bot=self.bot, update=update)
+            except Exception:
+                logger.exception('Ошибка при обработке апдейта из очереди')
+            finally:
+                self.queue.task_done()
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+
+        if 'callback_query' in update:
+            async with self._slots:
+                # Ждем результат и при параллельной обработке апдейтов,
+                # чтобы ответ на callback ушел в ответе на вебхук
+                result = await self.dispatcher.feed_webhook_update(
+                    bot, update, wait_for_result=True, **self.data
+                )
+            if not isinstance(result, TelegramMethod):
+                result = None
+            return web.Response(body=self._build_response_writer(bot=bot, result=result))
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            return web.Response(status=503)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    # Вызывается при остановке приложения, когда прием запросов уже прекращен:
+    # дожидается (до общего срока остановки), пока воркеры разберут
+    # принятые апдейты, и останавливает их.
+    # Сессию бота не закрывает - ею еще пользуются обрабатываемые апдейты,
+    # ее закрывает main() после их завершения.
+    async def close(self) -> None:
+        try:
+            await asyncio.wait_for(self.queue.join(), self.stop.remaining())
+        except asyncio.TimeoutError:
+            logger.warning('%s webhook updates dropped on shutdown', self.queue.qsize())
+        
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+
+
+# Запускает aiohttp-приложение с обработчиком апдейтов по пути path
+async def _start_app(bot: Bot, dp: Dispatcher, host: str, port: int, path: str,
+                     stop: ShutdownEvent, secret_token: Optional[str] = None) -> web.AppRunner:
+    app = web.Application()
+
+    QueuedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        workers=settings.WEBHOOK_WORKERS,
+        queue_size=settings.WEBHOOK_QUEUE_SIZE,
+        stop=stop,
+        secret_token=secret_token,
+    ).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+
+    # Запросы, уже принятые при остановке, дорабатываются не дольше
+    # SHUTDOWN_TIMEOUT; общий срок остановки ограничивает stop_app()
+    runner = web.AppRunner(app, shutdown_timeout=settings.SHUTDOWN_TIMEOUT)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    return runner
+
+
+# Останавливает aiohttp-приложение: прекращает прием запросов и дает
+# уже принятым доработать, но не дольше общего срока остановки
+async def stop_app(runner: web.AppRunner, stop: ShutdownEvent) -> None:
+    try:
+        await asyncio.wait_for(runner.cleanup(), stop.remaining())
+    except asyncio.TimeoutError:
+        logger.warning('Server did not stop in time, pending requests dropped')
+
+
+# Регистрирует вебхук в Telegram
+async def set_webhook(bot: Bot, allowed_updates: list[str]) -> None:
+    await bot.set_webhook(
+        url=f'{settings.WEBHOOK_URL}{settings.WEBHOOK_PATH}',
+        secret_token=settings.WEBHOOK_SECRET,
+        allowed_updates=allowed_updates,
+        drop_pending_updates=True,
+    )
+
+
+# Запускает aiohttp-сервер, регистрирует вебхук в Telegram
+# и принимает апдейты, пока не будет установлено событие stop
+async def run_webhook(bot: Bot, dp: Dispatcher, stop: ShutdownEvent) -> None:
+    runner = await _start_app(
+        bot, dp, settings.WEBAPP_HOST, settings.WEBAPP_PORT,
+        settings.WEBHOOK_PATH, stop, settings.WEBHOOK_SECRET,
+    )
+
+    try:
+        await set_webhook(bot, dp.resolve_used_update_types())
+        logger.info('Webhook server started on %s:%s', settings.WEBAPP_HOST, settings.WEBAPP_PORT)
+
+        # Работаем, пока процесс не остановят
+        await stop.wait()
+    finally:
+        await stop_app(runner, stop)
+
+
+# Запускает сервер процесса-шарда: апдейты приходят не от Telegram,
+# а от фронтового процесса (sharding/front.py) по локальному адресу
+async def run_shard_server(bot: Bot, dp: Dispatcher, shard: int, stop: ShutdownEvent) -> None:
+    port = settings.SHARD_BASE_PORT + shard
+    runner = await _start_app(bot, dp, settings.SHARD_HOST, port, settings.SHARD_PATH, stop)
+
+    try:
+        logger.info('Shard %s started on %s:%s', shard, settings.SHARD_HOST, port)
+        await stop.wait()
+    finally:
+        await stop_app(runner, stop)